@@ -0,0 +1,117 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+#Sync views
+from auction.views import AuctionViewSet, BidViewSet, StatisticView
+
+#Request metrics
+from auction.metrics import track_queries
+
+
+def database_sync_to_async(func):
+    """
+    Run ORM code in the shared thread pool instead of the thread of the request,
+    so the event loop keeps serving other connections while it waits for the database.
+    Django 4.0 has no async QuerySet methods yet, the ones of later versions work the same way
+    """
+
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            with track_queries():
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+class AsyncReadView:
+    """
+    Async GET / HEAD handler over a DRF view: authentication, permissions, filtering,
+    pagination and serializers are the ones of `view_class`, only database access
+    is awaited. Other methods are passed to the sync view
+    """
+
+    view_class = None
+    actions = None
+
+    @classmethod
+    def as_view(cls):
+        actions = dict(cls.actions) if cls.actions else None
+        if actions and 'get' in actions:
+            actions.setdefault('head', actions['get'])
+
+        sync_view = sync_to_async(cls.view_class.as_view(cls.actions) if cls.actions else cls.view_class.as_view())
+
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_view(request, *args, **kwargs)
+            return await cls().dispatch(request, actions, *args, **kwargs)
+
+        # Same labels in request metrics as the sync view
+        view.cls = cls.view_class
+        view.actions = actions
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, actions, *args, **kwargs):
+        handler = self.view_class()
+        if actions:
+            handler.action_map = actions
+            for method, action in actions.items():
+                setattr(handler, method, getattr(handler, action))
+        if not hasattr(handler, 'head'):
+            # As View.setup() does
+            handler.head = handler.get
+
+        handler.args, handler.kwargs = args, kwargs
+        request = handler.initialize_request(request, *args, **kwargs)
+        handler.request = request
+        handler.headers = handler.default_response_headers
+
+        try:
+            # One pool call per request: authentication, conditional GET validators,
+            # queryset and serialization share one database connection
+            response = await database_sync_to_async(self.handle)(handler, request, *args, **kwargs)
+        except Exception as exc:
+            response = handler.handle_exception(exc)
+
+        return self.rendered(handler.finalize_response(request, response, *args, **kwargs))
+
+    @staticmethod
+    def handle(handler, request, *args, **kwargs):
+        """ Database part of the request: checks and the action of the sync view """
+        handler.initial(request, *args, **kwargs)
+        return getattr(handler, request.method.lower())(request, *args, **kwargs)
+
+    @staticmethod
+    def rendered(response):
+        """
+        Render DRF response here, Django would render it in a sync thread otherwise
+        """
+        if not hasattr(response, 'render'):
+            return response
+
+        response.render()
+        return HttpResponse(response.content, status=response.status_code, headers=dict(response.items()))
+
+
+class AsyncAuctionListView(AsyncReadView):
+    view_class = AuctionViewSet
+    actions = {'get': 'list', 'post': 'create'}
+
+
+class AsyncAuctionDetailView(AsyncReadView):
+    view_class = AuctionViewSet
+    actions = {'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'}
+
+
+class AsyncBidListView(AsyncReadView):
+    view_class = BidViewSet
+    actions = {'get': 'list', 'post': 'create'}
+
+
+class AsyncStatisticView(AsyncReadView):
+    view_class = StatisticView
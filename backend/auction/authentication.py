@@ -0,0 +1,54 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from auction.cache import user_cache
+
+
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+class VersionedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """ Put user token_version into issued tokens, so changing password or deactivation revokes them """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication which takes the user from the process-local user cache
+    instead of reading the user row on every request.
+    Token version claim has to match user token_version, tokens issued
+    before the claim existed are checked for user being active only
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        version = validated_token.get(TOKEN_VERSION_CLAIM)
+        values = user_cache.get(user_id)
+
+        # Stale entry may hold an older version than a freshly issued token
+        if values is None or (version is not None and version != values['token_version']):
+            values = user_cache.load(user_id)
+
+        if values is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        user = user_cache.build(values)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if version is not None and version != user.token_version:
+            raise AuthenticationFailed(_('Token is revoked'), code='token_revoked')
+
+        return user
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+def auction_channel(auction_id):
+    """ Name of pub/sub channel with events of the auction """
+    return f'auction_{auction_id}'
+
+
+def encode_event(event, data):
+    """
+    Encode event once for all subscribers as `<event>\n<json data>`
+    """
+    return f'{event}\n{data}'
+
+
+def decode_event(message):
+    """ Return (event, json data) of encoded message """
+    event, _, data = message.partition('\n')
+    return event, data
+
+
+class BaseBroker:
+    """
+    Pub/sub interface used to push auction events to stream subscribers.
+    publish() is called from sync code (views, commands) after commit,
+    subscribe() is used by ASGI stream handlers
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """ Async context manager yielding asyncio.Queue of messages """
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    """
+    Broker delivering messages to subscribers of the current process.
+    Every message is pushed once to each subscribed queue, the payload
+    is encoded by publisher only once
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+
+        with self._lock:
+            first = not self._subscribers[channel]
+            self._subscribers[channel].add(subscriber)
+        if first:
+            self.on_first_subscriber(channel)
+
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+                last = not self._subscribers[channel]
+                if last:
+                    del self._subscribers[channel]
+            if last:
+                self.on_last_subscriber(channel)
+
+    def on_first_subscriber(self, channel):
+        pass
+
+    def on_last_subscriber(self, channel):
+        pass
+
+
+class PostgresNotifyBroker(InProcessBroker):
+    """
+    Broker shared by all workers through Postgres LISTEN/NOTIFY.
+    Each process keeps one listening connection and LISTENs only channels
+    which have local subscribers, then fans messages out in-process
+    """
+
+    def __init__(self, using='default'):
+        super().__init__()
+        self.using = using
+        self._listener = None
+
+    def publish(self, channel, message):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [channel, message])
+
+    def _listen(self, sql):
+        if self._listener is None:
+            import psycopg2
+
+            self._listener = psycopg2.connect(**connections[self.using].get_connection_params())
+            self._listener.autocommit = True
+            asyncio.get_running_loop().add_reader(self._listener.fileno(), self._dispatch)
+
+        with self._listener.cursor() as cursor:
+            cursor.execute(sql)
+
+    def _dispatch(self):
+        self._listener.poll()
+        while self._listener.notifies:
+            notify = self._listener.notifies.pop(0)
+            InProcessBroker.publish(self, notify.channel, notify.payload)
+
+    def on_first_subscriber(self, channel):
+        self._listen(f'LISTEN "{channel}"')
+
+    def on_last_subscriber(self, channel):
+        self._listen(f'UNLISTEN "{channel}"')
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Broker shared by all workers, WSGI and ASGI, through Redis pub/sub (AUCTION_STREAM_REDIS_URL).
+    Each ASGI process keeps one subscriber connection which SUBSCRIBEs only channels
+    with local subscribers, then fans messages out in-process
+    """
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url or settings.AUCTION_STREAM_REDIS_URL
+        self._client = None
+        self._pubsub = None
+        self._commands = None
+        self._reader = None
+
+    def publish(self, channel, message):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(channel, message)
+
+    def _execute(self, command, channel):
+        if self._pubsub is None:
+            import redis.asyncio
+
+            self._pubsub = redis.asyncio.Redis.from_url(self.url, decode_responses=True).pubsub()
+            # Keeps SUBSCRIBE / UNSUBSCRIBE of a channel in order
+            self._commands = asyncio.Lock()
+        asyncio.ensure_future(self._run(command, channel))
+
+    async def _run(self, command, channel):
+        async with self._commands:
+            try:
+                await getattr(self._pubsub, command)(channel)
+            except Exception:
+                logger.exception('Failed to %s %s', command, channel)
+                return
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.ensure_future(self._dispatch())
+
+    async def _dispatch(self):
+        # Ends when no channel is subscribed any more
+        async for message in self._pubsub.listen():
+            if message['type'] == 'message':
+                InProcessBroker.publish(self, message['channel'], message['data'])
+
+    def on_first_subscriber(self, channel):
+        self._execute('subscribe', channel)
+
+    def on_last_subscriber(self, channel):
+        self._execute('unsubscribe', channel)
+
+
+_broker = None
+
+
+def get_broker():
+    """ Return broker configured by AUCTION_STREAM_BROKER setting """
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'AUCTION_STREAM_BROKER', 'auction.broker.InProcessBroker'))()
+    return _broker
+
+
+def publish_event(auction_id, event, data):
+    """
+    Publish event (data is JSON string) to the auction channel
+    once the current transaction is committed
+    """
+    channel, message = auction_channel(auction_id), encode_event(event, data)
+
+    def publish():
+        try:
+            get_broker().publish(channel, message)
+        except Exception:
+            logger.exception('Failed to publish %s event to %s', event, channel)
+
+    transaction.on_commit(publish)
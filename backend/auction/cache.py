@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, IntegerField, Value, When
+
+
+# Backends keeping entries in the memory of one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache(setting):
+    """
+    Return cache of the alias named by the setting, ImproperlyConfigured if it is
+    kept in process memory and so is not seen by other workers (set CACHE_URL)
+    """
+    alias = getattr(settings, setting)
+    if settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(f'{setting} cache "{alias}" is local to the process, configure a shared cache')
+    return caches[alias]
+
+
+class RegionCache:
+    """
+    Process-local cache of regions (id -> name).
+    Every worker keeps its own copy and reloads it when the shared version
+    changes. Version is mtime of a small file, so checking it costs one stat()
+    and all gunicorn workers of the host see the same value
+    """
+
+    def __init__(self):
+        self._regions = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def version_file(self):
+        return settings.REGION_CACHE_VERSION_FILE
+
+    def _shared_version(self):
+        try:
+            return os.stat(self.version_file).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def all(self):
+        """ Return dict of region id -> name ordered by id """
+        version = self._shared_version()
+        regions = self._regions
+
+        if regions is None or version != self._version:
+            with self._lock:
+                Region = apps.get_model('auction', 'Region')
+                # Reload follows invalidation, a lagging replica would be cached until the next bump
+                regions = dict(Region.objects.using(DEFAULT_DB_ALIAS).order_by('pk').values_list('pk', 'name'))
+                self._regions, self._version = regions, version
+
+        return regions
+
+    def get(self, pk):
+        """ Return region name or None if there is no such region """
+        return self.all().get(pk)
+
+    def name_rank(self):
+        """
+        Return SQL expression with position of auction region in regions sorted by name,
+        lets order auctions by region name without joining region table
+        """
+        regions = sorted(self.all().items(), key=lambda item: (item[1], item[0]))
+        return Case(
+            *[When(region_id=pk, then=Value(rank)) for rank, (pk, _) in enumerate(regions)],
+            default=Value(len(regions)),
+            output_field=IntegerField(),
+        )
+
+    def invalidate(self):
+        """
+        Bump shared version now and once more after commit,
+        so no worker keeps regions loaded before the change was visible
+        """
+        self._bump()
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        path = self.version_file
+        version = max(time.time_ns(), self._shared_version() + 1)
+        with open(path, 'a'):
+            os.utime(path, ns=(version, version))
+        self._regions = None
+
+
+region_cache = RegionCache()
+
+
+def region_choices():
+    """ Choices of region filters, a plain function survives form field deepcopy """
+    return list(region_cache.all().items())
+
+
+class UserCache:
+    """
+    Process-local cache of authenticated users (id -> token_version and auth fields).
+    Entries live USER_CACHE_TTL seconds, saving a user drops the entry right away
+    in the current process; other workers pick the change up when the entry expires
+    """
+
+    FIELDS = ('id', 'email', 'is_active', 'is_staff', 'is_superuser', 'token_version')
+
+    def __init__(self):
+        self._users = {}
+
+    def get(self, pk):
+        """ Return cached fields of a user or None """
+        entry = self._users.get(pk)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def load(self, pk):
+        """
+        Read user fields from the primary database and cache them, None if there is no such user.
+        A lagging replica could bring back token_version of revoked tokens for the whole TTL
+        """
+        User = apps.get_model('auction', 'User')
+        values = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).values(*self.FIELDS).first()
+        if values is not None:
+            self._users[pk] = (time.monotonic() + settings.USER_CACHE_TTL, values)
+        return values
+
+    def build(self, values):
+        """
+        Build user instance from cached fields, the rest fields are deferred,
+        so save() of such instance never overwrites them
+        """
+        User = apps.get_model('auction', 'User')
+        # from_db() takes values in the order of model fields
+        fields = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+        return User.from_db(DEFAULT_DB_ALIAS, fields, [values[field] for field in fields])
+
+    def invalidate(self, pk):
+        self._users.pop(pk, None)
+
+    def clear(self):
+        self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class CollectionVersions:
+    """
+    Versions of auction lists for list ETags (auction.conditional): one counter
+    per region and one for all auctions in COLLECTION_VERSION_CACHE shared by all workers.
+    Counters are bumped after commit, so writes add no row lock to the bid transaction.
+    A lost counter starts again from the current time and never matches ETags issued before
+    """
+
+    ALL = 'all'
+
+    @property
+    def cache(self):
+        return caches[settings.COLLECTION_VERSION_CACHE]
+
+    @staticmethod
+    def key(scope):
+        return f'collection_version:{scope}'
+
+    def get(self, region_id=None):
+        """ Return version of auctions of the region, of all auctions by default """
+        key = self.key(self.ALL if region_id is None else region_id)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, regions=None):
+        """ Bump versions of the regions (all regions by default) once the transaction is committed """
+        regions = None if regions is None else set(regions)
+        transaction.on_commit(lambda: self._bump(regions))
+
+    def _bump(self, regions):
+        scopes = [self.ALL, *(region_cache.all() if regions is None else regions)]
+        for key in map(self.key, scopes):
+            if not self.cache.add(key, time.time_ns(), timeout=None):
+                self.cache.incr(key)
+
+
+collection_versions = CollectionVersions()
@@ -0,0 +1,64 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Class to add ETag / Last-Modified support to list and retrieve of ViewSets
+    over models with `version` and `modified_at` fields.
+    Validators are read before serialization, a matching If-None-Match / If-Modified-Since
+    gets 304 Not Modified. List ETag is the request path and get_collection_version(),
+    read only for requests with If-None-Match (any value gets the current ETag)
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.retrieve_validators(kwargs)
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(request, *validators, super().retrieve, args, kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if 'If-None-Match' not in request.headers:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(request, *self.list_validators(request), super().list, args, kwargs)
+
+    def retrieve_validators(self, kwargs):
+        """ Return (etag, modified_at) of the object, None if there is no such object """
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        state = (self.get_queryset().filter(**{self.lookup_field: kwargs[lookup]})
+                 .values('version', 'modified_at').first())
+        if state is None:
+            return None
+        return quote_etag(f'{kwargs[lookup]}-{state["version"]}'), state['modified_at']
+
+    def list_validators(self, request):
+        """ Return (etag, None) of the list """
+        scope = f'{request.get_full_path()}:{self.get_collection_version(request)}'
+        return quote_etag(hashlib.md5(scope.encode()).hexdigest()), None
+
+    def get_collection_version(self, request):
+        """ Return counter bumped by every write to the collection the request lists """
+        raise NotImplementedError
+
+    def conditional_response(self, request, etag, modified_at, handler, args, kwargs):
+        response = self.not_modified_response(request, etag, modified_at)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return self.set_validators(response, etag, modified_at)
+
+    @staticmethod
+    def not_modified_response(request, etag, modified_at):
+        """ Return 304 response if validators of the request match, otherwise None """
+        last_modified = int(modified_at.timestamp()) if modified_at else None
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    @staticmethod
+    def set_validators(response, etag, modified_at):
+        response['ETag'] = etag
+        if modified_at is not None:
+            response['Last-Modified'] = http_date(int(modified_at.timestamp()))
+        return response
@@ -1,28 +1,67 @@
 
+from django.core.validators import RegexValidator
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
-from auction.models import Region, Auction, Bid
+from auction.models import Auction, Bid
+from auction.cache import region_cache, region_choices
 
 
 class AuctionFilter(filters.FilterSet):
     """
-    Filter depends on size and region
+    Filter depends on size, region, current price and cadastral number
+    (full number, KOATUU prefix, zone and quarter)
     """
     min_size = filters.NumberFilter(field_name='size', lookup_expr='gte')
     max_size = filters.NumberFilter(field_name='size', lookup_expr='lte')
-    region = filters.ModelChoiceFilter(queryset=Region.objects.all())
+    min_price = filters.NumberFilter(field_name='current_price', lookup_expr='gt')
+    max_price = filters.NumberFilter(field_name='current_price', lookup_expr='lt')
+    region = filters.TypedChoiceFilter(choices=region_choices, coerce=int)
+    cadnumber = filters.CharFilter(method='filter_cadnumber',
+                                   validators=[RegexValidator(r'^\d{10}:\d{2}:\d{3}:\d{4}$')])
+    koatuu = filters.CharFilter(field_name='cad_koatuu', lookup_expr='startswith',
+                                validators=[RegexValidator(r'^\d{1,10}$')])
+    zone = filters.CharFilter(field_name='cad_zone', validators=[RegexValidator(r'^\d{2}$')])
+    quarter = filters.CharFilter(field_name='cad_quarter', validators=[RegexValidator(r'^\d{3}$')])
 
     class Meta:
         model=Auction
-        fields=['region', 'min_size', 'max_size']
+        fields=['region', 'min_size', 'max_size', 'min_price', 'max_price', 'cadnumber', 'koatuu', 'zone', 'quarter']
+
+    def filter_cadnumber(self, queryset, name, value):
+        """ Look up the parsed parts, so the search uses auction_cadnumber_idx """
+        koatuu, zone, quarter, parcel = value.split(':')
+        return queryset.filter(cad_koatuu=koatuu, cad_zone=zone, cad_quarter=quarter, cad_parcel=parcel)
 
 class BidFilter(filters.FilterSet):
     """
-    Filter depends on auction
+    Filter depends on auction, region of auction and bid time
     """
     auction = filters.ModelChoiceFilter(queryset=Auction.objects.all())
+    region = filters.TypedChoiceFilter(field_name='auction__region', choices=region_choices, coerce=int)
+    from_time = filters.IsoDateTimeFilter(field_name='bid_time', lookup_expr='gte')
+    to_time = filters.IsoDateTimeFilter(field_name='bid_time', lookup_expr='lt')
 
 
     class Meta:
         model=Bid
-        fields=['auction']
+        fields=['auction', 'region', 'from_time', 'to_time']
+
+
+
+class AuctionOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter which orders by region name through cached
+    region names instead of joining region table
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+
+        if any(field.lstrip('-') == 'region__name' for field in ordering):
+            queryset = queryset.annotate(region_rank=region_cache.name_rank())
+            ordering = [field.replace('region__name', 'region_rank') for field in ordering]
+
+        return queryset.order_by(*ordering)
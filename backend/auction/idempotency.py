@@ -0,0 +1,108 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+#Models
+from auction.models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Idempotency-Key was already used for another request'
+    default_code = 'idempotency_key_reused'
+
+
+def request_fingerprint(request):
+    """ Hash of path and payload of the request, uploaded files count by name and size """
+    data = request.data
+    payload = dict(data.lists()) if hasattr(data, 'lists') else data
+    content = json.dumps([request.path, payload], sort_keys=True,
+                         default=lambda value: [getattr(value, 'name', str(value)), getattr(value, 'size', None)])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Make create action of a ViewSet idempotent with Idempotency-Key header:
+    the key is claimed with a pending row before any work, successful result is stored
+    in it together with the created object and retries with the same key get it back
+    from one lookup until IDEMPOTENCY_KEY_TTL passes. A retry arriving while the first
+    request still runs waits for its result
+    """
+
+    # Seconds between reads of a pending key
+    idempotency_poll_interval = 0.05
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return super().create(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({IDEMPOTENCY_HEADER: ['Ensure this header has no more than 255 characters.']})
+
+        fingerprint = request_fingerprint(request)
+        claim = self.claim(request.user.pk, key, fingerprint)
+        if claim.status_code is not None:
+            return self.replay(claim)
+
+        try:
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                IdempotencyKey.objects.filter(pk=claim.pk).update(
+                    status_code=response.status_code,
+                    response=response.data,
+                    expires_at=datetime.now(timezone.utc) + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+        except Exception:
+            # Failed request is not stored, the key can be used again
+            claim.delete()
+            raise
+
+        return response
+
+    def claim(self, user_id, key, fingerprint):
+        """
+        Return stored result of the key, waiting while another request holds it,
+        or a new pending row of this request
+        """
+        while True:
+            now = datetime.now(timezone.utc)
+            stored = IdempotencyKey.objects.filter(user=user_id, key=key).first()
+
+            if stored is None:
+                try:
+                    with transaction.atomic():
+                        return IdempotencyKey.objects.create(
+                            user_id=user_id,
+                            key=key,
+                            fingerprint=fingerprint,
+                            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT),
+                        )
+                except IntegrityError:
+                    # Concurrent request with the same key claimed it first
+                    continue
+
+            if stored.expires_at <= now:
+                # Not swept yet or left pending by a crashed worker
+                IdempotencyKey.objects.filter(pk=stored.pk, expires_at=stored.expires_at).delete()
+                continue
+            if stored.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            if stored.status_code is not None:
+                return stored
+
+            time.sleep(self.idempotency_poll_interval)
+
+    @staticmethod
+    def replay(stored):
+        return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+
+class ImagePipeline:
+    """
+    Render WebP sizes of auction photos (settings.IMAGE_SIZES) in a background thread pool.
+    Result is stored to Auction.photo_renditions only if the photo is still the same,
+    so a photo replaced while rendering never gets renditions of the previous one.
+    IMAGE_WORKERS = 0 renders right in the calling thread
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(settings.IMAGE_WORKERS, thread_name_prefix='auction-images')
+        return self._executor
+
+    def submit(self, auction_id, name):
+        """ Schedule rendering of photo `name` of the auction """
+        if not settings.IMAGE_WORKERS:
+            return self.process(auction_id, name)
+        return self.executor.submit(self._run, auction_id, name)
+
+    def _run(self, auction_id, name):
+        try:
+            return self.process(auction_id, name)
+        except Exception:
+            logger.exception('Rendering of %s failed', name)
+        finally:
+            connections.close_all()
+
+    def process(self, auction_id, name):
+        """ Render all sizes of the photo and attach them to the auction, return size -> file name """
+        from auction.cache import collection_versions
+        from auction.models import Auction, version_bump
+
+        with default_storage.open(name) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+
+        stem = os.path.splitext(os.path.basename(name))[0]
+        renditions = {size: self.render(image, max_side, f'renditions/{stem}-{size}.webp')
+                      for size, max_side in settings.IMAGE_SIZES.items()}
+
+        auction = Auction.objects.filter(pk=auction_id, photo=name)
+        previous = auction.values_list('photo_renditions', flat=True).first()
+
+        if auction.update(photo_renditions=renditions, **version_bump()):
+            collection_versions.bump(auction.values_list('region', flat=True))
+            self.delete(previous or {})
+        else:
+            self.delete(renditions)
+        return renditions
+
+    @staticmethod
+    def render(image, max_side, name):
+        image = image.copy()
+        if max_side:
+            image.thumbnail((max_side, max_side))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB')
+
+        buffer = BytesIO()
+        image.save(buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4)
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    @staticmethod
+    def delete(renditions):
+        for name in renditions.values():
+            default_storage.delete(name)
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,226 @@
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone as django_timezone
+
+#Models
+from auction.models import Auction, Bid, RegionStatistic, User
+from auction.cache import region_cache
+
+
+class BaseImporter:
+    """
+    Bulk import of NDJSON rows.
+    Lines are read one by one, validated and inserted in chunks,
+    each chunk in its own transaction. Invalid rows are skipped
+    and reported with their line number
+    """
+
+    model = None
+    fields = ()
+    required = ()
+    chunk_size = 1000
+
+    def __init__(self, user):
+        self.user = user
+        self.created = 0
+        self.errors = []
+
+    def run(self, lines):
+        chunk = []
+
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                self.error(number, {'non_field_errors': ['Invalid JSON object']})
+                continue
+
+            chunk.append((number, row))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+
+        if chunk:
+            self.flush(chunk)
+
+        return {'created': self.created, 'errors': sorted(self.errors, key=lambda error: error['line'])}
+
+    def flush(self, chunk):
+        rows = []
+        for number, row in chunk:
+            values = self.clean_row(number, row)
+            if values is not None:
+                rows.append((number, values))
+
+        with transaction.atomic():
+            self.created += self.import_chunk(rows)
+
+    def clean_row(self, number, row):
+        """
+        Convert and validate row values with model fields.
+        Return values keyed by field attname or None if row is invalid
+        """
+        values, errors = {}, {}
+
+        for name in self.fields:
+            field = self.model._meta.get_field(name)
+            value = row.get(name)
+
+            if value in (None, ''):
+                if name in self.required:
+                    errors[name] = ['This field is required.']
+                continue
+
+            try:
+                value = field.to_python(value)
+                field.run_validators(value)
+            except DjangoValidationError as error:
+                errors[name] = error.messages
+                continue
+
+            if isinstance(value, datetime) and django_timezone.is_naive(value):
+                value = django_timezone.make_aware(value)
+
+            values[field.attname] = value
+
+        if errors:
+            self.error(number, errors)
+            return None
+        return values
+
+    def error(self, number, errors):
+        self.errors.append({'line': number, 'errors': errors})
+
+    def import_chunk(self, rows):
+        """ Insert cleaned rows, return number of created objects """
+        raise NotImplementedError
+
+
+class AuctionImporter(BaseImporter):
+    """
+    Import auctions: cadnumber, size, duration, region, optional start_date and author.
+    Author defaults to the importing user
+    """
+
+    model = Auction
+    fields = ('cadnumber', 'size', 'duration', 'region', 'start_date', 'author')
+    required = ('cadnumber', 'size', 'duration', 'region')
+
+    def import_chunk(self, rows):
+        regions = region_cache.all()
+        authors = set(User.objects.filter(pk__in={values['author_id'] for _, values in rows if 'author_id' in values})
+                      .values_list('pk', flat=True))
+
+        auctions = []
+        for number, values in rows:
+            values.setdefault('author_id', self.user.pk)
+
+            errors = {}
+            if values['region_id'] not in regions:
+                errors['region'] = ['Region does not exist']
+            if values['author_id'] != self.user.pk and values['author_id'] not in authors:
+                errors['author'] = ['User does not exist']
+            if errors:
+                self.error(number, errors)
+                continue
+
+            # Auction.save() is not called by bulk_create, fill what it computes
+            auction = Auction(**values)
+            auction.duration_timedelta = timedelta(hours=auction.duration)
+            auction.ends_at = auction.start_date + auction.duration_timedelta
+            auction.parse_cadnumber()
+            auctions.append(auction)
+
+        Auction.objects.bulk_create(auctions)
+
+        statistic = defaultdict(lambda: defaultdict(int))
+        for auction in auctions:
+            region_id, counters = auction.statistic_values()
+            for name, value in counters.items():
+                statistic[region_id][name] += value
+        for region_id, delta in statistic.items():
+            RegionStatistic.objects.apply(region_id, delta)
+
+        return len(auctions)
+
+
+class BidImporter(BaseImporter):
+    """
+    Import bid history: auction, author, price and optional bid_time.
+    Bids are chained per auction in bid_time order after the current last bid
+    and must follow Bid.clean() rules: the lot author can't bid, the same author
+    can't bid twice in a row and bid_time must be within the auction time
+    """
+
+    model = Bid
+    fields = ('auction', 'author', 'price', 'bid_time')
+    required = ('auction', 'author', 'price')
+
+    def import_chunk(self, rows):
+        auctions = Auction.objects.select_for_update().in_bulk({values['auction_id'] for _, values in rows})
+        authors = set(User.objects.filter(pk__in={values['author_id'] for _, values in rows})
+                      .values_list('pk', flat=True))
+        last_bids = Bid.objects.in_bulk([auction.last_bid_id for auction in auctions.values() if auction.last_bid_id])
+
+        now = datetime.now(timezone.utc)
+        for _, values in rows:
+            values.setdefault('bid_time', now)
+
+        bids, chains = [], defaultdict(list)
+        for number, values in sorted(rows, key=lambda row: (row[1]['bid_time'], row[0])):
+            auction = auctions.get(values['auction_id'])
+            chain = chains[values['auction_id']]
+            previous = chain[-1] if chain else last_bids.get(auction.last_bid_id) if auction else None
+
+            error = None
+            if auction is None:
+                error = {'auction': ['Auction does not exist']}
+            elif values['author_id'] not in authors:
+                error = {'author': ['User does not exist']}
+            elif auction.closed:
+                error = {'auction': ['Auction is closed']}
+            elif values['author_id'] == auction.author_id:
+                error = {'author': ["Author of the lot can't bid"]}
+            elif previous is not None and previous.author_id == values['author_id']:
+                error = {'author': ["The same author can't make two bids in a row"]}
+            elif previous is not None and values['bid_time'] < previous.bid_time:
+                error = {'bid_time': ['Bid is older than the last bid of the auction']}
+            elif not auction.start_date <= values['bid_time'] <= auction.end_time():
+                error = {'bid_time': ['Bid is out of auction time']}
+            if error:
+                self.error(number, error)
+                continue
+
+            bid = Bid(**values)
+            bids.append(bid)
+            chain.append(bid)
+
+        # Bid.save() is not called by bulk_create, link chains and refresh auctions in bulk
+        Bid.objects.bulk_create(bids)
+
+        linked = []
+        for auction_id, chain in chains.items():
+            previous = last_bids.get(auctions[auction_id].last_bid_id) if auction_id in auctions else None
+            for bid in chain:
+                bid.previous_bid = previous
+                linked.append(bid)
+                previous = bid
+        Bid.objects.bulk_update(linked, ['previous_bid'], batch_size=self.chunk_size)
+
+        touched = [auctions[auction_id] for auction_id, chain in chains.items() if chain]
+        before = {auction.pk: auction.statistic_values() for auction in touched}
+        Auction.objects.filter(pk__in=before).refresh_bid_summary()
+        for auction in Auction.objects.filter(pk__in=before):
+            RegionStatistic.objects.record(before[auction.pk], auction.statistic_values())
+
+        return len(bids)
@@ -0,0 +1,300 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+#Models
+from auction.models import Auction, Region, User
+
+
+class LoadTestContext:
+    """
+    Dataset used by scenarios: one region, lot owner, one bidder per worker thread,
+    one hot auction and a set of cold auctions. Existing rows are reused between runs
+    """
+
+    def __init__(self, auctions, bidders):
+        self.region = Region.objects.get_or_create(name='Loadtest')[0]
+        owner = User.objects.get_or_create(email='loadtest-owner@example.com')[0]
+        self.bidders = [
+            User.objects.get_or_create(email=f'loadtest-bidder-{i}@example.com')[0]
+            for i in range(bidders)
+        ]
+        self.tokens = [str(AccessToken.for_user(user)) for user in [owner] + self.bidders]
+
+        open_auctions = Auction.objects.filter(author=owner, closed=False,
+                                               ends_at__gt=datetime.now(timezone.utc) + timedelta(hours=1))
+        ids = list(open_auctions.order_by('pk').values_list('pk', flat=True)[:auctions])
+        for _ in range(auctions - len(ids)):
+            ids.append(Auction.objects.create(
+                cadnumber='0000000000:00:000:0000',
+                size=random.uniform(0.1, 100),
+                duration=24 * 30,
+                start_date=datetime.now(timezone.utc),
+                author=owner,
+                region=self.region,
+            ).pk)
+
+        self.hot, self.cold = ids[0], ids[1:] or ids
+
+
+class Scenario:
+    """ Request factory: method and function (context, rng, worker) -> (path, data) """
+
+    def __init__(self, name, method, request):
+        self.name = name
+        self.method = method
+        self.request = request
+
+
+SCENARIOS = [
+    Scenario('list', 'get', lambda ctx, rng, worker: ('/auction/', {})),
+    Scenario('list_filtered', 'get', lambda ctx, rng, worker: (
+        '/auction/', {'region': ctx.region.pk, 'min_size': rng.uniform(0, 50)})),
+    Scenario('list_ordered_by_price', 'get', lambda ctx, rng, worker: ('/auction/', {'ordering': '-price'})),
+    Scenario('detail', 'get', lambda ctx, rng, worker: (f'/auction/{rng.choice(ctx.cold)}', {})),
+    Scenario('bid_hot', 'post', lambda ctx, rng, worker: (
+        '/bid/', {'auction': ctx.hot, 'price': rng.randint(1, 10 ** 6)})),
+    Scenario('bid_cold', 'post', lambda ctx, rng, worker: (
+        '/bid/', {'auction': rng.choice(ctx.cold), 'price': rng.randint(1, 10 ** 6)})),
+    Scenario('bid_list', 'get', lambda ctx, rng, worker: ('/bid/', {'auction': rng.choice(ctx.cold)})),
+    Scenario('statistic', 'get', lambda ctx, rng, worker: ('/auction/statistic', {})),
+    Scenario('audit', 'post', lambda ctx, rng, worker: ('/auction/audit', {})),
+]
+
+
+class InProcessTransport:
+    """ Send requests through Django test client (URL routes, middleware, views, no socket) """
+
+    def __init__(self, token):
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def request(self, method, path, data):
+        return getattr(self.client, method)(path, data).status_code
+
+    def close(self):
+        for connection in connections.all():
+            connection.close()
+
+
+class HttpTransport:
+    """ Send requests to a running server """
+
+    def __init__(self, token, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def request(self, method, path, data):
+        url = self.base_url + path
+        if method == 'get':
+            return self.session.get(url, params=data).status_code
+        return self.session.request(method, url, data=data).status_code
+
+    def close(self):
+        self.session.close()
+
+
+class AsgiTransport:
+    """ Send requests straight to an ASGI application: one worker process, no socket """
+
+    def __init__(self, token, application):
+        self.application = application
+        self.headers = [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())]
+
+    async def request(self, method, path, data):
+        query, body, headers = '', b'', list(self.headers)
+        if method == 'get':
+            query = urlencode(data)
+        else:
+            body = urlencode(data).encode()
+            headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+            headers.append((b'content-length', str(len(body)).encode()))
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method.upper(), 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '', 'headers': headers,
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        done = asyncio.Event()
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                done.set()
+
+        await self.application(scope, receive, send)
+        return status[0]
+
+
+@contextmanager
+def database_latency(seconds):
+    """
+    Add `seconds` to every SQL query of connections opened inside the block,
+    emulates network round trips to a remote database
+    """
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # Wrappers of a connection object survive reconnects, install once.
+        # First position keeps execute_wrapper() blocks popping their own wrapper
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, delay)
+
+    if not seconds:
+        yield
+        return
+
+    connection_created.connect(install, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+
+
+def percentile(values, fraction):
+    """ Nearest-rank percentile of sorted values """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_scenario(scenario, context, concurrency, requests_per_worker, base_url=None, seed=0, workers=None):
+    """
+    Run scenario with `concurrency` threads, each sending `requests_per_worker` requests.
+    `workers` limits requests served at once in-process, like a pool of sync server workers.
+    Return latency percentiles (ms), throughput and status code counts
+    """
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    slots = threading.Semaphore(workers) if workers else None
+
+    def worker(index):
+        token = context.tokens[1 + index % len(context.bidders)]
+        transport = HttpTransport(token, base_url) if base_url else InProcessTransport(token)
+        rng = random.Random(seed * 1000 + index)
+        try:
+            for _ in range(requests_per_worker):
+                path, data = scenario.request(context, rng, index)
+                started = time.perf_counter()
+                try:
+                    with slots or nullcontext():
+                        code = str(transport.request(scenario.method, path, data))
+                except Exception:
+                    code = 'error'
+                elapsed = time.perf_counter() - started
+
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[code] = statuses.get(code, 0) + 1
+        finally:
+            transport.close()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+
+    return summary(latencies, statuses, wall_time)
+
+
+def run_async_scenario(scenario, context, concurrency, requests_per_worker, application, seed=0):
+    """
+    Run scenario with `concurrency` clients of one ASGI application on one event loop
+    (one async server worker). Return the same report as run_scenario()
+    """
+    latencies, statuses = [], {}
+
+    async def client(index):
+        transport = AsgiTransport(context.tokens[1 + index % len(context.bidders)], application)
+        rng = random.Random(seed * 1000 + index)
+        for _ in range(requests_per_worker):
+            path, data = scenario.request(context, rng, index)
+            started = time.perf_counter()
+            try:
+                code = str(await transport.request(scenario.method, path, data))
+            except Exception:
+                code = 'error'
+            latencies.append(time.perf_counter() - started)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    async def run():
+        await asyncio.gather(*(client(index) for index in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    wall_time = time.perf_counter() - started
+
+    return summary(latencies, statuses, wall_time)
+
+
+def summary(latencies, statuses, wall_time):
+    """ Percentiles are None when no request completed """
+    latencies.sort()
+    errors = sum(count for code, count in statuses.items() if code == 'error' or code.startswith('5'))
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throttled': statuses.get('429', 0),
+        'statuses': statuses,
+        'throughput_rps': round(len(latencies) / wall_time, 2),
+        'p50_ms': milliseconds(percentile(latencies, 0.50)),
+        'p95_ms': milliseconds(percentile(latencies, 0.95)),
+        'p99_ms': milliseconds(percentile(latencies, 0.99)),
+    }
+
+
+def milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two reports scenario by scenario.
+    Return list of regressions: latency percentile grew or throughput fell
+    by more than `threshold` (fraction), or new server errors or throttled (429)
+    requests appeared, latencies of throttled requests don't measure the view
+    """
+    regressions = []
+
+    for name, new in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if old[metric] and new[metric] is not None and new[metric] > old[metric] * (1 + threshold):
+                regressions.append(f'{name}: {metric} {old[metric]} -> {new[metric]}')
+        if new['throughput_rps'] < old['throughput_rps'] * (1 - threshold):
+            regressions.append(f'{name}: throughput_rps {old["throughput_rps"]} -> {new["throughput_rps"]}')
+        if new['errors'] > old['errors']:
+            regressions.append(f'{name}: errors {old["errors"]} -> {new["errors"]}')
+        if new.get('throttled', 0) > old.get('throttled', 0):
+            regressions.append(f'{name}: throttled {old.get("throttled", 0)} -> {new["throttled"]}')
+
+    return regressions
@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from auction.loadtest import SCENARIOS, LoadTestContext, database_latency, run_async_scenario, run_scenario
+
+
+READ_SCENARIOS = ('list', 'list_filtered', 'list_ordered_by_price', 'detail', 'bid_list', 'statistic')
+
+
+class Command(BaseCommand):
+    """
+    Benchmark of read endpoints in one server worker: a sync worker (WSGI, one
+    request at a time) against the async views of auction_backend.asgi, at
+    several numbers of concurrent connections.
+    --db-latency adds a delay to every SQL query to emulate a remote database
+    """
+
+    help = 'Compare concurrent connections per worker of sync and async read paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=READ_SCENARIOS,
+                            help='Scenario to run, may be repeated (all read scenarios by default)')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Concurrent connections')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per connection')
+        parser.add_argument('--db-latency', type=float, default=2.0, help='Milliseconds added to every SQL query')
+        parser.add_argument('--auctions', type=int, default=200, help='Auctions in benchmark dataset')
+        parser.add_argument('--output', help='Write JSON report to file')
+
+    def handle(self, *args, **options):
+        from auction_backend.asgi import django_application
+
+        context = LoadTestContext(options['auctions'], max(options['concurrency']))
+        selected = options['scenario'] or READ_SCENARIOS
+        report = {
+            'meta': {'database': connection.vendor, 'db_latency_ms': options['db_latency'],
+                     'requests_per_connection': options['requests']},
+            'scenarios': {},
+        }
+
+        with database_latency(options['db_latency'] / 1000):
+            for scenario in SCENARIOS:
+                if scenario.name not in selected:
+                    continue
+
+                for concurrency in options['concurrency']:
+                    sync = run_scenario(scenario, context, concurrency, options['requests'], workers=1)
+                    asynchronous = run_async_scenario(scenario, context, concurrency, options['requests'],
+                                                      django_application)
+                    report['scenarios'].setdefault(scenario.name, {})[concurrency] = {
+                        'sync': sync, 'async': asynchronous}
+
+                    self.stderr.write(
+                        f'{scenario.name} x{concurrency}: '
+                        f'sync {sync["throughput_rps"]} rps p95 {sync["p95_ms"]} ms, '
+                        f'async {asynchronous["throughput_rps"]} rps p95 {asynchronous["p95_ms"]} ms')
+
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(data)
+        self.stdout.write(data)
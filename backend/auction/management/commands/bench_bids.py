@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from auction.models import Auction, Region, User
+from auction.services import BidConflict, place_bid
+
+
+class Command(BaseCommand):
+    """
+    Benchmark of the bid placement path:
+    N concurrent bidders fire bids at one hot auction.
+    Report accepted bids/sec, latency percentiles, conflict rate (lost races on the row lock)
+    and rejected rate (bids refused by bid rules).
+    Meant to be run against Postgres (SQLite has no row locks).
+    """
+
+    help = 'Fire concurrent bidders at one auction and report throughput, latency and conflicts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bidders', type=int, default=16, help='Number of concurrent bidders')
+        parser.add_argument('--attempts', type=int, default=50, help='Bid attempts per bidder')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark auction and users')
+
+    def handle(self, *args, **options):
+        bidders = [
+            User.objects.get_or_create(email=f'bench-bidder-{i}@example.com')[0]
+            for i in range(options['bidders'] + 1)
+        ]
+        owner = bidders.pop()
+        auction = Auction.objects.create(
+            cadnumber='0000000000:00:000:0000',
+            size=1,
+            duration=1,
+            start_date=datetime.now(timezone.utc),
+            author=owner,
+            region=Region.objects.get_or_create(name='Benchmark')[0],
+        )
+
+        latencies = []
+        outcomes = {'accepted': 0, 'conflict': 0, 'rejected': 0, 'error': 0}
+        lock = threading.Lock()
+        price = iter(range(1, 10 ** 9))
+
+        def bidder(user):
+            try:
+                for _ in range(options['attempts']):
+                    started = time.perf_counter()
+                    try:
+                        place_bid(auction.pk, user, next(price))
+                        outcome = 'accepted'
+                    except BidConflict:
+                        outcome = 'conflict'
+                    except ValidationError:
+                        # Bid rules (same author twice in a row, time is over), not a lost race
+                        outcome = 'rejected'
+                    except Exception:
+                        outcome = 'error'
+                    elapsed = time.perf_counter() - started
+
+                    with lock:
+                        latencies.append(elapsed)
+                        outcomes[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bidder, args=(user,)) for user in bidders]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - started
+
+        latencies.sort()
+        attempts = len(latencies)
+        report = {
+            'bidders': len(bidders),
+            'attempts': attempts,
+            **outcomes,
+            'wall_time_s': round(wall_time, 3),
+            'accepted_per_s': round(outcomes['accepted'] / wall_time, 1),
+            'p50_ms': round(latencies[attempts // 2] * 1000, 2),
+            'p99_ms': round(latencies[min(attempts - 1, int(attempts * 0.99))] * 1000, 2),
+            'conflict_rate': round(outcomes['conflict'] / attempts, 4),
+            'rejected_rate': round(outcomes['rejected'] / attempts, 4),
+        }
+
+        auction.refresh_from_db()
+        report['chain_consistent'] = auction.bid_count == outcomes['accepted']
+
+        if not options['keep']:
+            auction.delete()
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,85 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from auction.loadtest import LoadTestContext
+from auction.models import Auction, Bid
+from auction.renderers import FastJSONRenderer
+from auction.rows import RowListSerializer, get_row_encoder
+from auction.serializers import AuctionSerializer, BidSerializer
+from auction.services import place_bid
+
+
+class Command(BaseCommand):
+    """
+    Micro-benchmark of list serialization: ModelSerializer + JSONRenderer against
+    values() rows + RowEncoder + FastJSONRenderer over the same page of rows.
+    Reports rows/sec with and without the database read and checks both outputs are equal
+    """
+
+    help = 'Compare rows/sec of ModelSerializer and read-optimized list serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=200, help='Pages serialized per measurement')
+        parser.add_argument('--output', help='Write JSON report to file')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        context = LoadTestContext(rows, 2)
+        missing_bids = rows - Bid.objects.count()
+        for index in range(max(0, missing_bids)):
+            place_bid(context.hot, context.bidders[index % 2], Auction.objects.get(pk=context.hot).current_price + 1)
+
+        request = RequestFactory().get('/')
+        report = {'meta': {'database': connection.vendor, 'rows': rows, 'repeat': options['repeat']}, 'models': {}}
+
+        for name, queryset, serializer_class in (
+            ('auction', Auction.objects.select_related('settlement').order_by('pk'), AuctionSerializer),
+            ('bid', Bid.objects.order_by('pk'), BidSerializer),
+        ):
+            encoder = get_row_encoder(serializer_class)
+
+            def baseline(instances=None):
+                instances = list(queryset[:rows]) if instances is None else instances
+                data = serializer_class(instances, many=True, context={'request': request}).data
+                return JSONRenderer().render(data, 'application/json')
+
+            def fast(values=None):
+                values = list(queryset.values(*encoder.columns)[:rows]) if values is None else values
+                data = RowListSerializer(values, encoder=encoder, context={'request': request}).data
+                return FastJSONRenderer().render(data, 'application/json')
+
+            if baseline() != fast():
+                raise CommandError(f'{name}: outputs differ')
+
+            instances, values = list(queryset[:rows]), list(queryset.values(*encoder.columns)[:rows])
+            result = {
+                'model_serializer': self.measure(baseline, options['repeat'], rows),
+                'row_encoder': self.measure(fast, options['repeat'], rows),
+                'model_serializer_no_db': self.measure(lambda: baseline(instances), options['repeat'], rows),
+                'row_encoder_no_db': self.measure(lambda: fast(values), options['repeat'], rows),
+            }
+            result['speedup'] = round(result['row_encoder'] / result['model_serializer'], 2)
+            result['speedup_no_db'] = round(result['row_encoder_no_db'] / result['model_serializer_no_db'], 2)
+            report['models'][name] = result
+            self.stderr.write(f'{name}: {result["model_serializer"]} -> {result["row_encoder"]} rows/s '
+                              f'(x{result["speedup"]}), serialization only x{result["speedup_no_db"]}')
+
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(data)
+        self.stdout.write(data)
+
+    @staticmethod
+    def measure(action, repeat, rows):
+        """ Return rows/sec of `repeat` calls of action """
+        started = time.perf_counter()
+        for _ in range(repeat):
+            action()
+        return round(repeat * rows / (time.perf_counter() - started))
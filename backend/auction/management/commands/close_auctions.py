@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from auction.cache import collection_versions
+from auction.models import Auction
+
+
+class Command(BaseCommand):
+    """
+    Close open auctions which are run out of time (ends_at < now).
+    Run once (e.g. from cron) or as a long-running worker with --interval
+    """
+
+    help = 'Close expired auctions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Auctions closed per transaction')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running and close auctions every INTERVAL seconds')
+        parser.add_argument('--backfill', action='store_true',
+                            help='Fill ends_at of auctions created before it was stored')
+        parser.add_argument('--settle', action='store_true',
+                            help='Settle closed auctions which have no settlement yet')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            filled = Auction.objects.fill_ends_at()
+            self.stdout.write(f'Backfilled ends_at: {filled}')
+
+        if options['settle']:
+            settled = Auction.objects.settle()
+            if settled:
+                collection_versions.bump()
+            self.stdout.write(f'Settled closed auctions: {settled}')
+
+        while True:
+            started = time.perf_counter()
+            closed = Auction.objects.close_expired(batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{datetime.now(timezone.utc).isoformat()} closed={closed} time={elapsed:.3f}s')
+
+            if not options['interval']:
+                return
+
+            connection.close()
+            time.sleep(options['interval'])
@@ -0,0 +1,89 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from auction.loadtest import SCENARIOS, LoadTestContext, compare, run_scenario
+
+
+class Command(BaseCommand):
+    """
+    Load test of the REST API routes.
+    Run scenarios (list with filters and ordering, detail, bids on hot and cold
+    auctions, statistics, audit) at given concurrency and write p50/p95/p99
+    latency and throughput as JSON. In-process runs turn the bid throttle off,
+    otherwise bid scenarios measure 429 responses instead of place_bid.
+    With --compare BASELINE CURRENT report regressions between two runs
+    """
+
+    help = 'Run REST API load test or compare two load test reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+                            help='Scenario to run, may be repeated (all by default)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per client and scenario')
+        parser.add_argument('--auctions', type=int, default=200, help='Auctions in load test dataset')
+        parser.add_argument('--base-url', help='Send requests to running server instead of in-process client')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of request parameters')
+        parser.add_argument('--output', help='Write JSON report to file')
+        parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='Compare two reports')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='Allowed relative slowdown in compare mode (0.1 = 10%%)')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'])
+
+        context = LoadTestContext(options['auctions'], options['concurrency'])
+        selected = options['scenario'] or [scenario.name for scenario in SCENARIOS]
+        # Throttle of a running server can't be changed from here, its 429s are counted as throttled
+        throttle_rate = settings.BID_THROTTLE_RATE if options['base_url'] else 0
+
+        report = {
+            'meta': {
+                'started': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'concurrency': options['concurrency'],
+                'requests_per_client': options['requests'],
+                'target': options['base_url'] or 'in-process',
+                'bid_throttle_rate': throttle_rate,
+            },
+            'scenarios': {},
+        }
+
+        with override_settings(BID_THROTTLE_RATE=throttle_rate):
+            for scenario in SCENARIOS:
+                if scenario.name not in selected:
+                    continue
+                result = run_scenario(scenario, context, options['concurrency'], options['requests'],
+                                      options['base_url'], options['seed'])
+                report['scenarios'][scenario.name] = result
+                self.stderr.write(f'{scenario.name}: {result["throughput_rps"]} rps, '
+                                  f'p50 {result["p50_ms"]} ms, p95 {result["p95_ms"]} ms, p99 {result["p99_ms"]} ms, '
+                                  f'{result["throttled"]} throttled')
+
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(data)
+        self.stdout.write(data)
+
+    def compare(self, baseline, current, threshold):
+        with open(baseline) as file:
+            baseline = json.load(file)
+        with open(current) as file:
+            current = json.load(file)
+
+        regressions = compare(baseline, current, threshold)
+        for regression in regressions:
+            self.stdout.write(regression)
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) found')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
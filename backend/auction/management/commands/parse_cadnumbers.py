@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from auction.models import Auction
+
+
+class Command(BaseCommand):
+    """
+    Backfill / repair parsed cadastral number parts
+    (cad_koatuu, cad_zone, cad_quarter, cad_parcel) from cadnumber
+    """
+
+    help = 'Fill parsed cadastral number parts of auctions'
+
+    def handle(self, *args, **options):
+        updated = Auction.objects.all().parse_cadnumbers()
+        self.stdout.write(self.style.SUCCESS(f'Parsed cadastral numbers: {updated}'))
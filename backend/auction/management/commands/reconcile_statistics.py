@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auction.models import RegionStatistic
+
+
+class Command(BaseCommand):
+    """
+    Recompute RegionStatistic counters from auction table
+    and report regions which counters drifted
+    """
+
+    help = 'Recompute auction statistics from scratch and fix drifted counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drifted regions')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = RegionStatistic.objects.recompute()
+            stored = {row.pop('region'): row
+                      for row in RegionStatistic.objects.values('region', *RegionStatistic.COUNTERS)}
+            empty = dict.fromkeys(RegionStatistic.COUNTERS, 0)
+
+            drifted = []
+            for region_id in sorted(set(expected) | set(stored)):
+                actual = stored.get(region_id, empty)
+                wanted = expected.get(region_id, empty)
+                if any(abs(actual[name] - wanted[name]) > 1e-6 for name in RegionStatistic.COUNTERS):
+                    drifted.append(region_id)
+                    self.stdout.write(f'Region {region_id}: stored {actual}, expected {wanted}')
+
+            self.stdout.write(f'Regions with drifted statistics: {len(drifted)}')
+
+            if options['check'] or not drifted:
+                return
+
+            for region_id in drifted:
+                RegionStatistic.objects.update_or_create(region_id=region_id, defaults=expected.get(region_id, empty))
+
+            self.stdout.write(self.style.SUCCESS(f'Fixed regions: {len(drifted)}'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from auction.cache import collection_versions
+from auction.models import Auction
+
+
+class Command(BaseCommand):
+    """
+    Backfill / repair denormalized bid data of auctions
+    (current_price, last_bid, leader, bid_count) from bid table
+    """
+
+    help = 'Recompute current price, last bid, leader and bid count of auctions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report auctions with outdated bid data')
+
+    def handle(self, *args, **options):
+        stale = Auction.objects.stale().count()
+        self.stdout.write(f'Auctions with outdated bid data: {stale}')
+
+        if options['check']:
+            return
+
+        updated = Auction.objects.all().refresh_bid_summary()
+        collection_versions.bump()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed auctions: {updated}'))
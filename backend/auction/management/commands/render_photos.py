@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from auction.images import image_pipeline
+from auction.models import Auction
+
+
+class Command(BaseCommand):
+    """
+    Render WebP sizes of photos which have none,
+    e.g. uploaded before the image pipeline or lost with a stopped worker
+    """
+
+    help = 'Render missing photo sizes of auctions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Render again photos which already have sizes')
+
+    def handle(self, *args, **options):
+        auctions = Auction.objects.exclude(photo='')
+        if not options['all']:
+            auctions = auctions.filter(photo_renditions={})
+
+        rendered = 0
+        for pk, name in auctions.values_list('pk', 'photo').iterator():
+            try:
+                image_pipeline.process(pk, name)
+            except Exception as error:
+                self.stderr.write(f'Auction {pk}: {error}')
+            else:
+                rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered photos: {rendered}'))
@@ -0,0 +1,241 @@
+import csv
+import io
+import random
+import time
+from datetime import datetime, time as day_start, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from auction.cache import region_cache
+from auction.models import Auction, Bid, Region, User
+
+
+class CopyWriter:
+    """ Write rows with Postgres COPY ... FROM STDIN (CSV) """
+
+    def write(self, model, fields, rows):
+        columns = [model._meta.get_field(name).column for name in fields]
+        text_columns = [model._meta.get_field(name).column for name in fields
+                        if model._meta.get_field(name).get_internal_type() in ('CharField', 'FileField', 'ImageField')]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['' if value is None else value for value in row])
+        buffer.seek(0)
+
+        options = 'FORMAT csv'
+        if text_columns:
+            options += f', FORCE_NOT_NULL ({", ".join(text_columns)})'
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN WITH ({options})', buffer)
+
+
+class BulkCreateWriter:
+    """ Fallback for databases without COPY (SQLite) """
+
+    def write(self, model, fields, rows):
+        attnames = [model._meta.get_field(name).attname for name in fields]
+        model.objects.bulk_create([model(**dict(zip(attnames, row))) for row in rows], batch_size=1000)
+
+
+AUCTION_FIELDS = ('id', 'photo', 'photo_renditions', 'cadnumber', 'cad_koatuu', 'cad_zone', 'cad_quarter', 'cad_parcel', 'size', 'duration_timedelta', 'duration', 'start_date', 'ends_at',
+                  'closed', 'region', 'author', 'current_price', 'last_bid', 'leader', 'bid_count',
+                  'version', 'modified_at')
+BID_FIELDS = ('id', 'previous_bid', 'price', 'bid_time', 'auction', 'author')
+
+
+class Command(BaseCommand):
+    """
+    Generate a large synthetic dataset for benchmarks and EXPLAIN work.
+    Same --seed and --anchor give the same data.
+    - regions with long-tail popularity
+    - auctions with valid cadnumbers, a few hot ones collect --hot-share of all bids
+    - bids with consistent previous_bid chains and denormalized auction columns
+    Uses COPY on Postgres (secondary indexes are dropped during the load and
+    built afterwards) and bulk_create elsewhere
+    """
+
+    help = 'Seed millions of auctions and bids deterministically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--auctions', type=int, default=100000)
+        parser.add_argument('--bids', type=int, default=1000000)
+        parser.add_argument('--regions', type=int, default=25)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--hot-fraction', type=float, default=0.001, help='Share of auctions which are hot')
+        parser.add_argument('--hot-share', type=float, default=0.3, help='Share of bids going to hot auctions')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--anchor', type=datetime.fromisoformat,
+                            help='"Now" of generated data (ISO datetime), midnight UTC today by default')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Auctions per transaction')
+        parser.add_argument('--keep-indexes', action='store_true', help="Don't drop indexes during the load")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        anchor = options['anchor'] or datetime.combine(datetime.now(timezone.utc).date(), day_start(), timezone.utc)
+        if anchor.tzinfo is None:
+            anchor = anchor.replace(tzinfo=timezone.utc)
+
+        use_copy = connection.vendor == 'postgresql'
+        writer = CopyWriter() if use_copy else BulkCreateWriter()
+
+        regions = self.create_regions(options['regions'])
+        users = self.create_users(options['users'], options['seed'])
+        region_weights = [1 / (rank + 1) ** 1.1 for rank in range(len(regions))]
+
+        auction_id = (Auction.objects.aggregate(id=Max('id'))['id'] or 0) + 1
+        bid_id = (Bid.objects.aggregate(id=Max('id'))['id'] or 0) + 1
+        plan = self.plan_auctions(rng, options, anchor)
+
+        indexes = self.drop_indexes() if use_copy and not options['keep_indexes'] else []
+        created_auctions = created_bids = 0
+
+        try:
+            for offset in range(0, len(plan), options['batch_size']):
+                auctions, bids = [], []
+
+                for start_date, hours, bid_count in plan[offset:offset + options['batch_size']]:
+                    region = rng.choices(regions, region_weights)[0]
+                    author = rng.choice(users)
+                    size = round(rng.lognormvariate(0.5, 1.0), 4)
+                    cadnumber = self.cadnumber(rng)
+                    ends_at = start_date + timedelta(hours=hours)
+
+                    chain = self.bid_chain(rng, auction_id, bid_id, author, users, size,
+                                           start_date, min(ends_at, anchor), bid_count)
+                    bids.extend(chain)
+                    last = chain[-1] if chain else None
+
+                    auctions.append((
+                        auction_id, '', '{}' if use_copy else {}, cadnumber, *cadnumber.split(':'), size,
+                        f'{hours * 3600} seconds' if use_copy else timedelta(hours=hours),
+                        hours, start_date, ends_at, ends_at < anchor, region, author,
+                        last[2] if last else 0.0, last[0] if last else None, last[5] if last else None,
+                        len(chain), 1 + len(chain), last[3] if last else start_date,
+                    ))
+                    auction_id += 1
+                    bid_id += len(chain)
+
+                with transaction.atomic():
+                    writer.write(Auction, AUCTION_FIELDS, auctions)
+                    writer.write(Bid, BID_FIELDS, bids)
+
+                created_auctions += len(auctions)
+                created_bids += len(bids)
+                self.stderr.write(f'auctions {created_auctions}/{len(plan)}, bids {created_bids}')
+        finally:
+            if indexes:
+                self.stderr.write('Building indexes')
+                self.add_indexes(indexes)
+
+        if use_copy:
+            self.reset_sequences()
+
+        region_cache.invalidate()
+        Auction.objects.settle()
+        call_command('reconcile_statistics', stdout=io.StringIO())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created_auctions} auctions and {created_bids} bids '
+            f'in {time.perf_counter() - started:.1f}s'))
+
+    def create_regions(self, count):
+        existing = list(Region.objects.filter(name__startswith='Seed ').order_by('pk').values_list('pk', flat=True))
+        Region.objects.bulk_create([Region(name=f'Seed {index:03}') for index in range(len(existing), count)])
+        return list(Region.objects.filter(name__startswith='Seed ').order_by('pk').values_list('pk', flat=True))[:count]
+
+    def create_users(self, count, seed):
+        existing = User.objects.filter(email__startswith='seed-').count()
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(email=f'seed-{index}@example.com', password=password)
+            for index in range(existing, count)
+        ], batch_size=1000)
+        return list(User.objects.filter(email__startswith='seed-').order_by('pk').values_list('pk', flat=True))[:count]
+
+    def plan_auctions(self, rng, options, anchor):
+        """
+        Return (start_date, duration hours, number of bids) per auction.
+        Bids are split by Pareto weights, hot auctions share --hot-share of all bids
+        """
+        plan = []
+        for _ in range(options['auctions']):
+            start_date = anchor - timedelta(seconds=rng.randint(-86400, 60 * 86400))
+            hours = rng.choice((1, 2, 6, 12, 24, 72, 168, 240))
+            plan.append([start_date, hours, 0])
+
+        started = [index for index, (start_date, _, _) in enumerate(plan) if start_date < anchor]
+        if not started:
+            return plan
+
+        hot = set(rng.sample(started, max(1, int(len(started) * options['hot_fraction']))))
+        for group, share in ((sorted(hot), options['hot_share']),
+                             ([index for index in started if index not in hot], 1 - options['hot_share'])):
+            if not group:
+                continue
+            weights = [rng.paretovariate(1.5) for _ in group]
+            total_weight, budget = sum(weights), int(options['bids'] * share)
+            for index, weight in zip(group, weights):
+                plan[index][2] = int(budget * weight / total_weight)
+
+        return plan
+
+    @staticmethod
+    def cadnumber(rng):
+        return (f'{rng.randrange(10 ** 10):010}:{rng.randrange(100):02}:'
+                f'{rng.randrange(1000):03}:{rng.randrange(10000):04}')
+
+    @staticmethod
+    def bid_chain(rng, auction_id, bid_id, lot_author, users, size, start, end, count):
+        """
+        Return bid rows (id, previous_bid, price, bid_time, auction, author)
+        with growing time and price and no author bidding twice in a row
+        """
+        if count <= 0 or end <= start:
+            return []
+
+        span = (end - start).total_seconds()
+        offsets = sorted(rng.uniform(0, span) for _ in range(count))
+        price = round(size * rng.uniform(1000, 5000), 2)
+        previous_author = None
+        rows = []
+
+        for number, offset in enumerate(offsets):
+            author = rng.choice(users)
+            while author in (lot_author, previous_author):
+                author = rng.choice(users)
+
+            rows.append((bid_id + number, bid_id + number - 1 if number else None, price,
+                         start + timedelta(seconds=offset), auction_id, author))
+            price = round(price * rng.uniform(1.01, 1.05), 2)
+            previous_author = author
+
+        return rows
+
+    @staticmethod
+    def drop_indexes():
+        indexes = [(model, index) for model in (Auction, Bid) for index in model._meta.indexes]
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        return indexes
+
+    @staticmethod
+    def add_indexes(indexes):
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+
+    @staticmethod
+    def reset_sequences():
+        from django.core.management.color import no_style
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Auction, Bid, Region, User]):
+                cursor.execute(sql)
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from auction.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """
+    Delete expired idempotency keys in batches (expires_at index).
+    Run from cron or as a long-running worker with --interval
+    """
+
+    help = 'Delete expired idempotency keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Keys deleted per statement')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running and sweep keys every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = 0
+            while True:
+                ids = list(IdempotencyKey.objects.expired().values_list('pk', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+            self.stdout.write(f'Deleted expired idempotency keys: {deleted}')
+
+            if not options['interval']:
+                return
+
+            connection.close()
+            time.sleep(options['interval'])
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+METRICS = {
+    'auction_request_duration_seconds': ('histogram', 'Request latency', LATENCY_BUCKETS),
+    'auction_response_size_bytes': ('histogram', 'Response body size', SIZE_BUCKETS),
+    'auction_requests_total': ('counter', 'Handled requests', None),
+    'auction_db_queries_total': ('counter', 'SQL queries executed', None),
+    'auction_db_query_seconds_total': ('counter', 'Time spent in SQL queries', None),
+    'auction_serializer_seconds_total': ('counter', 'Time spent in serializers', None),
+    'auction_throttled_total': ('counter', 'Requests rejected by throttles', None),
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class MetricsRegistry:
+    """
+    Process-local registry of counters and histograms.
+    Every process dumps its values into its own file of METRICS_DIR
+    (at most once per METRICS_FLUSH_INTERVAL seconds), /metrics sums files
+    of all gunicorn workers
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+        self._loaded = False
+
+    @property
+    def path(self):
+        return os.path.join(settings.METRICS_DIR, f'metrics-{os.getpid()}.json')
+
+    def _load(self):
+        # Keep values of a previous process with the same pid
+        self._loaded = True
+        try:
+            with open(self.path) as file:
+                for name, labels, value in json.load(file):
+                    self._values[(name, tuple(map(tuple, labels)))] = value
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def inc(self, name, labels, value=1.0):
+        with self._lock:
+            key = (name, labels)
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self._lock:
+            key = (name, labels)
+            state = self._values.setdefault(key, [0] * (len(buckets) + 2))
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            data = [[name, labels, value] for (name, labels), value in self._values.items()]
+            self._flushed_at = now
+
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(data, file)
+        os.replace(temporary, self.path)
+
+    def collect(self):
+        """ Return values of all processes summed by (name, labels) """
+        self.flush(force=True)
+        total = {}
+
+        for filename in os.listdir(settings.METRICS_DIR):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, filename)) as file:
+                    data = json.load(file)
+            except (FileNotFoundError, ValueError):
+                continue
+
+            for name, labels, value in data:
+                key = (name, tuple(map(tuple, labels)))
+                if isinstance(value, list):
+                    stored = total.setdefault(key, [0] * len(value))
+                    total[key] = [a + b for a, b in zip(stored, value)]
+                else:
+                    total[key] = total.get(key, 0) + value
+
+        return total
+
+    def render(self):
+        """ Render collected values in Prometheus text format """
+        values = self.collect()
+        lines = []
+
+        for name, (kind, description, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+
+            for (metric, labels), value in sorted(values.items()):
+                if metric != name:
+                    continue
+                if kind == 'counter':
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+                    continue
+
+                for bound, count in zip(buckets + ('+Inf',), value[:len(buckets)] + [value[-1]]):
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {count}')
+                lines.append(f'{name}_sum{format_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_count{format_labels(labels)} {value[-1]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """ Timings of one request, reported in metrics and Server-Timing header """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.labels = (('view', 'unknown'), ('action', 'unknown'), ('method', 'unknown'))
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+@contextmanager
+def track_queries():
+    """ Count queries of connections of the current thread into metrics of the current request """
+    metrics = _current.get()
+    with ExitStack() as stack:
+        if metrics is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+        yield
+
+
+@contextmanager
+def timed_serializer():
+    """ Add time of the block to serializer time of the current request """
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.serializer += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Record per view action: latency, SQL query count and time,
+    serializer time and response size.
+    Values go to /metrics, and to Server-Timing response header
+    when SERVER_TIMING is on (DEBUG by default)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Same switch as django.utils.deprecation.MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if request.path_info == '/metrics':
+            return self.get_response(request)
+
+        metrics, token = self.start(request)
+        try:
+            with track_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self.finish(metrics, response)
+
+    async def __acall__(self, request):
+        if request.path_info == '/metrics':
+            return await self.get_response(request)
+
+        metrics, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+            if hasattr(request, 'metrics_queries'):
+                await sync_to_async(request.metrics_queries.close)()
+
+        return self.finish(metrics, response)
+
+    def start(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        return metrics, _current.set(metrics)
+
+    def finish(self, metrics, response):
+        total = time.perf_counter() - metrics.started
+        size = len(response.content) if not response.streaming else 0
+        labels = metrics.labels + (('status', str(response.status_code)),)
+
+        registry.observe('auction_request_duration_seconds', metrics.labels, total)
+        registry.observe('auction_response_size_bytes', metrics.labels, size)
+        registry.inc('auction_requests_total', labels)
+        registry.inc('auction_db_queries_total', metrics.labels, metrics.queries)
+        registry.inc('auction_db_query_seconds_total', metrics.labels, metrics.db)
+        registry.inc('auction_serializer_seconds_total', metrics.labels, metrics.serializer)
+        registry.flush()
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db * 1000:.2f};desc="{metrics.queries} queries", '
+                f'serializer;dur={metrics.serializer * 1000:.2f}, '
+                f'total;dur={total * 1000:.2f}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is None:
+            return None
+
+        view = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        name = view.__name__ if view is not None else view_func.__name__
+        actions = getattr(view_func, 'actions', None) or {}
+        method = request.method.lower()
+        metrics.labels = (('view', name), ('action', actions.get(method, method)), ('method', request.method))
+
+        # Under ASGI a sync view runs in the thread of this call (thread sensitive),
+        # count queries of its connections there, closed by __acall__
+        if self.is_async and not asyncio.iscoroutinefunction(view_func):
+            request.metrics_queries = ExitStack()
+            request.metrics_queries.enter_context(track_queries())
+        return None
+
+
+class MetricsView(APIView):
+    """ Prometheus scrape endpoint, staff only (scrape with a staff user JWT) """
+
+    permission_classes = [IsAdminUser]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Response is always Prometheus text, accept any Accept header
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,14 +1,25 @@
 
+import re
 from datetime import datetime, timedelta, timezone
 
 #Django & DRF imports
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import BooleanField, Case, Count, DateTimeField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Substr
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from rest_framework.serializers import ValidationError
 from django.core.validators import RegexValidator
 
+#Event stream
+from auction.broker import publish_event
+
+#Region cache
+from auction.cache import collection_versions, region_cache, user_cache
+from auction.images import image_pipeline
+
 
 
 class UserManager(BaseUserManager):
@@ -50,56 +61,352 @@ class User(AbstractUser):
     username = None
     email = models.EmailField(unique=True)
     avatar = models.ImageField()
+    token_version = models.PositiveIntegerField(default=1, editable=False)
     objects = UserManager()
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    def save(self, *args, **kwargs):
+        """ Redefine to revoke issued tokens on password change or deactivation """
+        update_fields = kwargs.get('update_fields')
+
+        if self.pk and (update_fields is None or {'password', 'is_active'} & set(update_fields)):
+            stored = User.objects.filter(pk=self.pk).values('password', 'is_active').first()
+            if stored and (stored['password'], stored['is_active']) != (self.password, self.is_active):
+                self.token_version += 1
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'token_version'}
+
+        super().save(*args, **kwargs)
+        user_cache.invalidate(self.pk)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        user_cache.invalidate(pk)
+        return result
+
 
 class Region(models.Model):
     """ ORM model to hold regions """
 
     name = models.CharField(max_length=25)
 
+    def save(self, *args, **kwargs):
+        """ Redefine to invalidate region cache of all workers """
+        super().save(*args, **kwargs)
+        region_cache.invalidate()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        region_cache.invalidate()
+        return result
+
+
+def version_bump():
+    """
+    Update values marking auction as changed for conditional GET (ETag / Last-Modified)
+    """
+    return {'version': F('version') + 1, 'modified_at': datetime.now(timezone.utc)}
+
+
+# KOATUU:zone:quarter:parcel
+CADNUMBER_PARTS = re.compile(r'^(\d{10}):(\d{2}):(\d{3}):(\d{4})')
+
+
+class AuctionQuerySet(models.QuerySet):
+    """
+    QuerySet to keep denormalized bid data of auctions
+    (current_price, last_bid, leader, bid_count) in sync with bid table
+    """
+
+    def _bid_summary(self):
+        latest = Bid.objects.filter(auction=OuterRef('pk')).order_by('-bid_time', '-pk')
+        count = (Bid.objects.filter(auction=OuterRef('pk'))
+                 .order_by().values('auction').annotate(count=Count('pk')).values('count'))
+        return {
+            'last_bid': Subquery(latest.values('pk')[:1]),
+            'current_price': Coalesce(Subquery(latest.values('price')[:1]), 0.0),
+            'leader': Subquery(latest.values('author')[:1]),
+            'bid_count': Coalesce(Subquery(count), 0),
+        }
+
+    def stale(self):
+        """
+        Return auctions which denormalized bid data differs from bid table
+        """
+        summary = self._bid_summary()
+        key = models.BigIntegerField()
+        query_set = self.annotate(
+            _last_bid=Coalesce(summary['last_bid'], 0, output_field=key),
+            _current_price=summary['current_price'],
+            _leader=Coalesce(summary['leader'], 0, output_field=key),
+            _bid_count=summary['bid_count'],
+            _stored_last_bid=Coalesce('last_bid', 0, output_field=key),
+            _stored_leader=Coalesce('leader', 0, output_field=key),
+        )
+        return query_set.filter(
+            ~Q(_stored_last_bid=F('_last_bid'))
+            | ~Q(current_price=F('_current_price'))
+            | ~Q(_stored_leader=F('_leader'))
+            | ~Q(bid_count=F('_bid_count'))
+        )
+
+    def close(self):
+        """
+        Mark open auctions of the queryset as closed, settle them,
+        move them to closed counters of RegionStatistic and notify stream subscribers.
+        Return number of closed auctions
+        """
+        with transaction.atomic():
+            ids = list(self.filter(closed=False).select_for_update().values_list('pk', flat=True))
+            if not ids:
+                return 0
+
+            closed = Auction.objects.filter(pk__in=ids).update(closed=True, **version_bump())
+            Auction.objects.filter(pk__in=ids).settle()
+
+            rows = Settlement.objects.filter(auction__in=ids).order_by().values('auction__region').annotate(
+                lots=Count('pk'),
+                sold=Count('pk', filter=Q(no_bids=False)),
+                price=Coalesce(Sum('final_price'), 0.0),
+            )
+            for row in rows:
+                RegionStatistic.objects.apply(row['auction__region'], {
+                    'number_active_lots': -row['lots'],
+                    'closed_lots_with_bids': row['sold'],
+                    'closed_price_sum': row['price'],
+                })
+
+            for auction_id in ids:
+                publish_event(auction_id, 'closed', f'{{"auction":{auction_id}}}')
+
+            return closed
+
+    def settle(self, now=None):
+        """
+        Write settlement of closed auctions of the queryset which are not settled yet
+        with a single INSERT ... SELECT from auction table.
+        Return number of settled auctions
+        """
+        now = now or datetime.now(timezone.utc)
+        using = router.db_for_write(Settlement)
+        sold = Q(bid_count__gt=0)
+        # Column order of the settlement table, each column is an annotation to keep the SELECT order
+        columns = {
+            'auction_id': F('pk'),
+            'winner_id': F('leader'),
+            'final_price': Case(When(sold, then='current_price')),
+            'price_per_hectare': Case(When(sold & Q(size__gt=0), then=F('current_price') / F('size'))),
+            'bid_count': F('bid_count'),
+            'no_bids': ExpressionWrapper(~sold, output_field=BooleanField()),
+            'settled_at': Value(now, output_field=DateTimeField()),
+        }
+        rows = (self.using(using).filter(closed=True, settlement__isnull=True).order_by()
+                .annotate(**{f'_settle_{name}': value for name, value in columns.items()})
+                .values_list(*[f'_settle_{name}' for name in columns]))
+        select, params = rows.query.get_compiler(using).as_sql()
+
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(Settlement._meta.db_table)} ({", ".join(map(quote, columns))}) {select}',
+                params,
+            )
+            return cursor.rowcount
+
+    def close_expired(self, batch_size=1000, now=None):
+        """
+        Close open auctions which ends_at passed, batch_size auctions per transaction.
+        Return number of closed auctions
+        """
+        now = now or datetime.now(timezone.utc)
+        total = 0
+
+        while True:
+            ids = list(self.filter(closed=False, ends_at__lt=now)
+                       .order_by('ends_at').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return total
+            total += Auction.objects.filter(pk__in=ids).close()
+
+    def fill_ends_at(self):
+        """
+        Fill ends_at of open auctions stored before it was, with a single UPDATE.
+        Run once (close_auctions --backfill), such auctions never match close_expired() before.
+        Return number of updated auctions
+        """
+        updated = self.filter(closed=False, ends_at__isnull=True).update(
+            ends_at=ExpressionWrapper(F('start_date') + F('duration_timedelta'), output_field=DateTimeField()))
+        if updated:
+            collection_versions.bump()
+        return updated
+
+    def parse_cadnumbers(self):
+        """
+        Fill parsed cadastral number parts with a single UPDATE
+        Return number of updated auctions
+        """
+        updated = self.filter(cadnumber__regex=CADNUMBER_PARTS.pattern).update(
+            cad_koatuu=Substr('cadnumber', 1, 10),
+            cad_zone=Substr('cadnumber', 12, 2),
+            cad_quarter=Substr('cadnumber', 15, 3),
+            cad_parcel=Substr('cadnumber', 19, 4),
+        )
+        if updated:
+            collection_versions.bump()
+        return updated
+
+    def refresh_bid_summary(self):
+        """
+        Recompute denormalized bid data with a single UPDATE
+        Return number of updated auctions
+        """
+        return self.update(**self._bid_summary(), **version_bump())
+
 
 class Auction(models.Model):
     """ ORM model to hold auctions """
 
     photo = models.ImageField(blank=True)
+    # WebP sizes of the photo (size -> file name), filled by auction.images in background
+    photo_renditions = models.JSONField(default=dict, blank=True, editable=False)
     cadnumber = models.CharField(max_length=23, validators=[RegexValidator(
             regex=r'\d{10}:\d{2}:\d{3}:\d{4}',
             message='The cadaster number should be in 0000000000:00:000:0000 format'
         )])
+    # Parsed cadnumber, indexed for search by full number, KOATUU prefix and zone / quarter
+    cad_koatuu = models.CharField(max_length=10, blank=True, default='', editable=False)
+    cad_zone = models.CharField(max_length=2, blank=True, default='', editable=False)
+    cad_quarter = models.CharField(max_length=3, blank=True, default='', editable=False)
+    cad_parcel = models.CharField(max_length=4, blank=True, default='', editable=False)
     size = models.FloatField()
     duration_timedelta = models.DurationField(default=timedelta(hours=1))
     duration = models.IntegerField(validators=[MinValueValidator(1)])
     start_date = models.DateTimeField(default=datetime.now)
-    #current_price = models.FloatField(default=0.0)                     #Replaced by method
+    ends_at = models.DateTimeField(editable=False, null=True)
     closed = models.BooleanField(default=False)
     region = models.ForeignKey(Region, on_delete=models.CASCADE)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
-   
 
-    @property
-    def last_bid(self):
+    # Denormalized bid data, maintained by Bid.save() and Bid.delete()
+    current_price = models.FloatField(default=0.0)
+    last_bid = models.ForeignKey('Bid', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    leader = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    bid_count = models.IntegerField(default=0)
+
+    # Bumped on every change of the auction or its bids, used as ETag
+    version = models.IntegerField(default=1)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = AuctionQuerySet.as_manager()
+
+    BID_SUMMARY_FIELDS = ('current_price', 'last_bid_id', 'leader_id', 'bid_count')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['current_price', 'id']),
+            models.Index(fields=['size', 'id']),
+            models.Index(fields=['ends_at'], condition=Q(closed=False), name='auction_open_ends_at_idx'),
+            # pattern_ops let Postgres use the index for LIKE 'prefix%' whatever the collation is
+            models.Index(fields=['cad_koatuu', 'cad_zone', 'cad_quarter', 'cad_parcel'], name='auction_cadnumber_idx',
+                         opclasses=['varchar_pattern_ops'] * 4),
+            models.Index(fields=['cad_zone', 'cad_quarter'], name='auction_cad_zone_quarter_idx'),
+        ]
+
+    def end_time(self):
+        """ ends_at, computed for auctions stored before it was filled """
+        return self.ends_at or self.start_date + self.duration_timedelta
+
+    def parse_cadnumber(self):
+        """ Fill cadastral number parts from cadnumber, empty if it is malformed """
+        match = CADNUMBER_PARTS.match(self.cadnumber or '')
+        self.cad_koatuu, self.cad_zone, self.cad_quarter, self.cad_parcel = match.groups() if match else ('',) * 4
+
+    def statistic_values(self):
         """
-        Return the last bid according to bid_time.
-        Return None if there is no such bid
+        Return region and contribution of the auction to RegionStatistic counters.
+        Closed auctions count with their settled result
         """
-        if self.bid_set.exists():
-            return self.bid_set.latest('bid_time')
-        else:
-            return None
-    
-    @property
-    def current_price(self):
+        bid_count, price = self.bid_count, self.current_price
+        if self.closed:
+            settled = Settlement.objects.filter(auction=self.pk).values_list('bid_count', 'final_price').first()
+            if settled:
+                bid_count, price = settled
+
+        sold = self.closed and bid_count > 0
+        return self.region_id, {
+            'number_all_lots': 1,
+            'number_active_lots': int(not self.closed),
+            'all_land_size': self.size,
+            'auctions_with_no_bids': int(bid_count == 0),
+            'closed_lots_with_bids': int(sold),
+            'closed_price_sum': price if sold else 0.0,
+        }
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None) -> None:
         """
-        Return the last price according to bid was made
-        Return 0.0 if there are no bids at all
+        Redefine to keep RegionStatistic counters up to date.
+        Denormalized bid data is never written from here,
+        it belongs to Bid.save() and Bid.delete().
+        Auction closed here is settled, settled auction can't be reopened.
+        New photo is sent to the image pipeline after commit
         """
-        if self.bid_set.exists():
-            return self.bid_set.latest('bid_time').price
-        else:
-            return 0.0
+        self.ends_at = self.start_date + self.duration_timedelta
+        if update_fields is not None and {'start_date', 'duration_timedelta'} & set(update_fields):
+            update_fields = list(update_fields) + ['ends_at']
+
+        self.parse_cadnumber()
+        if update_fields is not None and 'cadnumber' in update_fields:
+            update_fields = list(update_fields) + ['cad_koatuu', 'cad_zone', 'cad_quarter', 'cad_parcel']
+
+        with transaction.atomic(using=using):
+            before = None
+            was_closed = False
+            new_photo = bool(self.photo) and not self.photo._committed
+            outdated_renditions = {}
+
+            if not self._state.adding:
+                stored = Auction.objects.select_for_update().filter(pk=self.pk).first()
+                if stored:
+                    was_closed = stored.closed
+                    if was_closed and not self.closed and Settlement.objects.filter(auction=self.pk).exists():
+                        raise ValidationError({'closed': 'Settled auction can not be reopened'})
+                    for field in self.BID_SUMMARY_FIELDS:
+                        setattr(self, field, getattr(stored, field))
+                    if new_photo or stored.photo.name != self.photo.name:
+                        outdated_renditions, self.photo_renditions = stored.photo_renditions, {}
+                    else:
+                        self.photo_renditions = stored.photo_renditions
+                    self.version = stored.version + 1
+                    before = stored.statistic_values()
+                    if update_fields is None:
+                        update_fields = [field.name for field in self._meta.concrete_fields
+                                         if not field.primary_key and field.attname not in self.BID_SUMMARY_FIELDS]
+                    else:
+                        update_fields = list(update_fields) + ['version', 'modified_at']
+
+            super().save(force_insert, force_update, using, update_fields)
+            if self.closed and not was_closed:
+                Auction.objects.filter(pk=self.pk).settle()
+                self._state.fields_cache.pop('settlement', None)
+            RegionStatistic.objects.record(before, self.statistic_values())
+
+            if outdated_renditions:
+                transaction.on_commit(lambda: image_pipeline.delete(outdated_renditions), using=using)
+            if new_photo:
+                pk, name = self.pk, self.photo.name
+                transaction.on_commit(lambda: image_pipeline.submit(pk, name), using=using)
+
+    def delete(self, using=None, keep_parents=False):
+        with transaction.atomic(using=using):
+            # Settlement is deleted along with the auction
+            values = self.statistic_values()
+            result = super().delete(using, keep_parents)
+            RegionStatistic.objects.record(values, None)
+
+        return result
 
 
 class Bid(models.Model):
@@ -112,10 +419,16 @@ class Bid(models.Model):
     auction = models.ForeignKey(Auction, on_delete=models.CASCADE)
     author = models.ForeignKey(User, on_delete=models.DO_NOTHING)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['auction', 'bid_time', 'id']),
+            models.Index(fields=['bid_time', 'id']),
+        ]
+
     def clean(self) -> None:
         
         #Check if bider is not an author of the lot
-        if self.author == self.auction.author:
+        if self.author_id == self.auction.author_id:
             raise ValidationError("Author of the lot can't bid")
 
         # Populate the previous bid if there are none of
@@ -124,10 +437,14 @@ class Bid(models.Model):
 
         #Check if last bid don't have the same author
         if self.previous_bid:
-            if self.previous_bid.author == self.author:
+            if self.previous_bid.author_id == self.author_id:
                 raise ValidationError ("The same author can't make two bids in a row")
 
-        if self.auction.start_date + self.auction.duration_timedelta < datetime.now(timezone.utc):
+        # Closed auction is settled, its result can't change
+        if self.auction.closed:
+            raise ValidationError ("Auction is closed")
+
+        if self.auction.end_time() < datetime.now(timezone.utc):
             raise ValidationError ("Auction is run out of time")
 
         return super().clean()
@@ -136,22 +453,198 @@ class Bid(models.Model):
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None) -> None:
         """
         Redefine to invoke model.clean() method during every save 
-        to enforce some additional model level validation
+        to enforce some additional model level validation.
+        New bid also updates denormalized bid data of the auction
+        within the same transaction
         """
         self.clean()
-        return super().save(force_insert, force_update, using, update_fields)
+        adding = self._state.adding
+
+        with transaction.atomic(using=using):
+            super().save(force_insert, force_update, using, update_fields)
+
+            if adding:
+                before = self.auction.statistic_values()
+                Auction.objects.filter(pk=self.auction_id).update(
+                    current_price=self.price,
+                    last_bid=self.pk,
+                    leader=self.author_id,
+                    bid_count=F('bid_count') + 1,
+                    **version_bump(),
+                )
+                self.auction.current_price = self.price
+                self.auction.last_bid = self
+                self.auction.leader_id = self.author_id
+                self.auction.bid_count += 1
+                self.auction.version += 1
+                RegionStatistic.objects.record(before, self.auction.statistic_values())
 
     
     def delete(self, using=None, keep_parents=False):
 
         """
-        In case of bid is deleting change all forward bids if there are any
+        In case of bid is deleting relink the next bid (if there is any)
+        to the previous one with a single UPDATE
+        and recompute denormalized bid data of the auction
         """
-        later_bid = self.auction.bid_set.filter(bid_time__gte = self.bid_time).order_by('bid_time').first()
-        later_bid.previous_bid = self.previous_bid
-        
-        return super().delete(using, keep_parents)
+        with transaction.atomic(using=using):
+            before = self.auction.statistic_values()
+            pk = self.pk
+            result = super().delete(using, keep_parents)
+            Bid.objects.filter(previous_bid=pk).update(previous_bid=self.previous_bid_id)
+            Auction.objects.filter(pk=self.auction_id).refresh_bid_summary()
+            self.auction.refresh_from_db(fields=Auction.BID_SUMMARY_FIELDS)
+            RegionStatistic.objects.record(before, self.auction.statistic_values())
+
+        return result
+
+
+class ProxyBid(models.Model):
+    """
+    Maximum price a user is ready to pay for an auction.
+    Proxy bids answer other bids automatically (auction.services.resolve_proxies)
+    """
+
+    auction = models.ForeignKey(Auction, on_delete=models.CASCADE)
+    author = models.ForeignKey(User, on_delete=models.CASCADE)
+    max_price = models.FloatField(validators=[MinValueValidator(0)])
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['auction', 'author'], name='auction_proxybid_unique_author'),
+        ]
+        indexes = [
+            models.Index(fields=['auction', 'max_price']),
+        ]
+
+
+class Settlement(models.Model):
+    """
+    ORM model to hold immutable result of a closed auction.
+    Written in batch by AuctionQuerySet.settle()
+    """
+
+    auction = models.OneToOneField(Auction, on_delete=models.CASCADE, primary_key=True, related_name='settlement')
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    # Empty when there were no bids
+    final_price = models.FloatField(blank=True, null=True)
+    price_per_hectare = models.FloatField(blank=True, null=True)
+    bid_count = models.IntegerField()
+    no_bids = models.BooleanField()
+    settled_at = models.DateTimeField()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError('Settlement can not be changed')
+        super().save(*args, **kwargs)
+
+
+class RegionStatisticManager(models.Manager):
+    """
+    Manager to maintain RegionStatistic counters incrementally
+    """
+
+    def record(self, before, after):
+        """
+        Apply change of auction contribution to counters.
+        before / after are Auction.statistic_values() results or None
+        """
+        changes = {}
+        for values, sign in ((before, -1), (after, 1)):
+            if values is None:
+                continue
+            region_id, counters = values
+            delta = changes.setdefault(region_id, {})
+            for name, value in counters.items():
+                delta[name] = delta.get(name, 0) + sign * value
+
+        for region_id, delta in changes.items():
+            self.apply(region_id, delta)
+
+    def apply(self, region_id, delta):
+        """
+        Add delta (counter name -> value) to counters of the region,
+        list version of the region is bumped after commit (auction.cache.collection_versions)
+        """
+        collection_versions.bump([region_id])
+        changes = {name: F(name) + value for name, value in delta.items() if value}
+        if not changes:
+            return
+        if not self.filter(region_id=region_id).update(**changes):
+            self.get_or_create(region_id=region_id)
+            self.filter(region_id=region_id).update(**changes)
+
+    def recompute(self):
+        """
+        Return counters per region calculated from scratch over auction table
+        """
+        # Closed auctions count with their settled result, if there is one
+        no_bids = Q(settlement__no_bids=True) | Q(settlement__isnull=True, bid_count=0)
+        sold = Q(closed=True) & ~no_bids
+        rows = Auction.objects.order_by().values('region').annotate(
+            number_all_lots=Count('pk'),
+            number_active_lots=Count('pk', filter=Q(closed=False)),
+            all_land_size=Sum('size'),
+            auctions_with_no_bids=Count('pk', filter=no_bids),
+            closed_lots_with_bids=Count('pk', filter=sold),
+            closed_price_sum=Coalesce(Sum(Coalesce('settlement__final_price', 'current_price'), filter=sold), 0.0),
+        )
+        return {row.pop('region'): row for row in rows}
+
+
+class RegionStatistic(models.Model):
+    """
+    ORM model to hold auction counters per region.
+    Updated on auction create/patch/close/delete and bid insert/delete
+    """
+
+    region = models.OneToOneField(Region, on_delete=models.CASCADE, primary_key=True, related_name='statistic')
+    number_all_lots = models.IntegerField(default=0)
+    number_active_lots = models.IntegerField(default=0)
+    all_land_size = models.FloatField(default=0.0)
+    auctions_with_no_bids = models.IntegerField(default=0)
+    closed_lots_with_bids = models.IntegerField(default=0)
+    closed_price_sum = models.FloatField(default=0.0)
+
+    objects = RegionStatisticManager()
+
+    COUNTERS = ('number_all_lots', 'number_active_lots', 'all_land_size',
+                'auctions_with_no_bids', 'closed_lots_with_bids', 'closed_price_sum')
 
     
 
     
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+
+    def expired(self, now=None):
+        return self.filter(expires_at__lte=now or datetime.now(timezone.utc))
+
+
+class IdempotencyKey(models.Model):
+    """
+    ORM model to hold result of a create request sent with Idempotency-Key header,
+    replayed for retries with the same key until expires_at (auction.idempotency).
+    The row is written as a pending claim before the request runs
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # Hash of path and payload, the key can't be reused for another request
+    fingerprint = models.CharField(max_length=64)
+    # Both are null while the request holding the key is running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    expires_at = models.DateTimeField()
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='auction_idempotencykey_unique_user_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
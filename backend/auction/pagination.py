@@ -0,0 +1,161 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination.
+    Cursor holds ordering values of the boundary row, so the next page is
+    fetched with a WHERE on (ordering fields, id) instead of COUNT(*) + OFFSET.
+    Ordering comes from the `ordering` query param (fields allowed by the view
+    ordering_fields, with aliases of view.cursor_ordering_aliases like price -> current_price)
+    or falls back to view.cursor_ordering. The primary key is always added as a tie-breaker.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    default_ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, view):
+        aliases = getattr(view, 'cursor_ordering_aliases', {})
+        allowed = list(getattr(view, 'ordering_fields', None) or []) + list(aliases.values())
+        ordering = []
+
+        for term in request.query_params.get('ordering', '').split(','):
+            term = term.strip()
+            name = aliases.get(term.lstrip('-'), term.lstrip('-'))
+            if name in allowed:
+                ordering.append(('-' if term.startswith('-') else '') + name)
+
+        if not ordering:
+            ordering = list(getattr(view, 'cursor_ordering', self.default_ordering))
+
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+
+        return ordering
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return list(data['v']), bool(data.get('r', False))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        values = []
+        for field in self.ordering:
+            if isinstance(row, dict):
+                values.append(row[field.lstrip('-')])
+                continue
+            value = row
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+
+        data = json.dumps({'v': values, 'r': reverse}, default=str, separators=(',', ':'))
+        encoded = b64encode(data.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def keyset_filter(self, values, reverse):
+        """
+        Build (a, b, id) > (va, vb, vid) as a chain of OR-ed prefixes
+        honouring direction of every ordering field
+        """
+        condition = Q()
+        equal = Q()
+
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= equal & Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            equal &= Q(**{name: value})
+
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, view)
+
+        values, reverse = self.decode_cursor(request)
+        if values is not None and len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if queryset._fields:
+            # values() rows need the ordering values for cursors
+            names = [field.lstrip('-') for field in ordering]
+            queryset = queryset.values(*queryset._fields, *[name for name in names if name not in queryset._fields])
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page number pagination by default.
+    Switch to KeysetPagination when client opts in with ?pagination=cursor
+    or follows a link with ?cursor=...
+    """
+
+    cursor_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor':
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -13,7 +13,7 @@ class IsAuthor(permissions.BasePermission):
 
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.author == request.user
+        return obj.author_id == request.user.id
 
 
 class NoAuctionAuthor(permissions.BasePermission):
@@ -27,7 +27,7 @@ class NoAuctionAuthor(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS or not isinstance(obj, Bid):
             return True
-        return not obj.auction.author == request.user
+        return obj.auction.author_id != request.user.id
 
 
 class LessThenFiveMinPass(permissions.BasePermission):
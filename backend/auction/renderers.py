@@ -0,0 +1,30 @@
+from rest_framework.compat import SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer with one encoder per process for the common compact case,
+    output is the same bytes. Indented rendering (browsable API, `indent` media type
+    parameter) goes through JSONRenderer
+    """
+
+    _encoder = None
+
+    @classmethod
+    def get_encoder(cls):
+        if cls._encoder is None:
+            cls._encoder = cls.encoder_class(ensure_ascii=cls.ensure_ascii, allow_nan=not cls.strict,
+                                             separators=SHORT_SEPARATORS)
+        return cls._encoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (not self.compact or (renderer_context or {}).get('indent') is not None
+                or (accepted_media_type and accepted_media_type != self.media_type)):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        ret = self.get_encoder().encode(data)
+        # Same escaping as JSONRenderer, keeps output a strict javascript subset
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
@@ -0,0 +1,111 @@
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from auction.cache import shared_cache
+
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads of safe-method requests to a random alias of settings.DATABASE_REPLICAS.
+    Writes, reads of other requests, reads inside transactions and everything
+    outside requests (commands, background workers) use the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and _replica_reads.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def request_user_id(request):
+    """ User id of the JWT access token of the request, None for anonymous or invalid token """
+    parts = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(parts) != 2 or parts[0] not in api_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return UntypedToken(parts[1]).get(api_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Allow replica reads for safe-method requests.
+    A successful unsafe request makes reads of its user stick to the primary
+    for REPLICA_STICKY_SECONDS, so users always see their own bids.
+    Marks live in REPLICA_STICKY_CACHE, replicas are refused unless it is shared by all workers
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.DATABASE_REPLICAS:
+            # Refuse to start with marks no other worker sees
+            shared_cache('REPLICA_STICKY_CACHE')
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Same switch as django.utils.deprecation.MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        token = _replica_reads.set(self.use_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.after_response(request, response)
+
+    async def __acall__(self, request):
+        token = _replica_reads.set(self.use_replicas(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.after_response(request, response)
+
+    @property
+    def sticky_cache(self):
+        return shared_cache('REPLICA_STICKY_CACHE')
+
+    @staticmethod
+    def sticky_key(user_id):
+        return f'replica-sticky:{user_id}'
+
+    def use_replicas(self, request):
+        if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+            return False
+        user_id = request_user_id(request)
+        return user_id is None or not self.sticky_cache.get(self.sticky_key(user_id))
+
+    def after_response(self, request, response):
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+            user_id = request_user_id(request)
+            if user_id is not None:
+                self.sticky_cache.set(self.sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+        return response
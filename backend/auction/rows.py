@@ -0,0 +1,177 @@
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+
+#Request metrics
+from auction.metrics import timed_serializer
+
+
+# Fields which representation of a not null value is a plain type conversion
+PLAIN_FIELDS = {
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.CharField: str,
+    serializers.BooleanField: bool,
+}
+
+
+class RowEncoder:
+    """
+    Converter of values() rows to the representation of a ModelSerializer.
+    Fields of the serializer are inspected once, columns are the values() names
+    to fetch. SerializerMethodField `name` needs `row_method_sources[name]` (columns)
+    and `get_<name>_row(*values)` on the serializer
+    """
+
+    def __init__(self, serializer_class, prefix=''):
+        self.serializer_class = serializer_class
+        self.prefix = prefix
+        self._plan = None
+
+    @property
+    def plan(self):
+        """ [(field name, kind, columns, extra)] """
+        if self._plan is None:
+            self._plan = self.compile()
+        return self._plan
+
+    @property
+    def columns(self):
+        columns = []
+        for _, kind, names, extra in self.plan:
+            columns.extend(names)
+            if kind == 'nested':
+                columns.extend(extra.columns)
+        return list(dict.fromkeys(columns))
+
+    def compile(self):
+        serializer = self.serializer_class()
+        model = self.serializer_class.Meta.model
+        sources = getattr(self.serializer_class, 'row_method_sources', {})
+        plan = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            column = self.prefix + field.source.replace('.', '__')
+
+            if isinstance(field, serializers.SerializerMethodField):
+                columns = tuple(self.prefix + source for source in sources[name])
+                plan.append((name, 'method', columns, f'{field.method_name}_row'))
+            elif isinstance(field, serializers.BaseSerializer):
+                # Primary key of the related row is None when there is no such row
+                plan.append((name, 'nested', (f'{column}__pk',), RowEncoder(type(field), f'{column}__')))
+            elif isinstance(field, serializers.FileField) and getattr(field, 'use_url',
+                                                                      api_settings.UPLOADED_FILES_USE_URL):
+                plan.append((name, 'file', (column,), model._meta.get_field(field.source).storage))
+            elif isinstance(field, serializers.RelatedField):
+                # values() gives the primary key of the related object
+                plan.append((name, 'value', (column,), None))
+            else:
+                plan.append((name, 'value', (column,), PLAIN_FIELDS.get(type(field), field.to_representation)))
+
+        return plan
+
+    def bind(self, context):
+        """ Return function converting a row to dict, bound to serializer context (request) """
+        serializer = self.serializer_class(context=context)
+        request = context.get('request')
+        converters = []
+
+        for name, kind, columns, extra in self.plan:
+            if kind == 'value':
+                convert = self.value_converter(columns[0], extra)
+            elif kind == 'file':
+                convert = self.file_converter(columns[0], extra, request)
+            elif kind == 'method':
+                convert = self.method_converter(columns, getattr(serializer, extra))
+            else:
+                convert = self.nested_converter(columns[0], extra.bind(context))
+            converters.append((name, convert))
+
+        def encode(row):
+            return {name: convert(row) for name, convert in converters}
+
+        return encode
+
+    @staticmethod
+    def value_converter(column, to_representation):
+        if to_representation is None:
+            return lambda row: row[column]
+
+        def convert(row):
+            value = row[column]
+            return None if value is None else to_representation(value)
+        return convert
+
+    @staticmethod
+    def file_converter(column, storage, request):
+        def convert(row):
+            name = row[column]
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+
+    @staticmethod
+    def method_converter(columns, method):
+        return lambda row: method(*[row[column] for column in columns])
+
+    @staticmethod
+    def nested_converter(column, encode):
+        return lambda row: None if row[column] is None else encode(row)
+
+
+_encoders = {}
+
+
+def get_row_encoder(serializer_class):
+    """ Return RowEncoder of the serializer class, compiled once per process """
+    encoder = _encoders.get(serializer_class)
+    if encoder is None:
+        encoder = _encoders[serializer_class] = RowEncoder(serializer_class)
+    return encoder
+
+
+class RowListSerializer(serializers.BaseSerializer):
+    """ Read-only serializer of values() rows, same output as `many=True` of the encoder serializer """
+
+    many = True
+
+    def __init__(self, instance=None, encoder=None, **kwargs):
+        self.encoder = encoder
+        super().__init__(instance, **kwargs)
+
+    def to_representation(self, rows):
+        encode = self.encoder.bind(self.context)
+        return [encode(row) for row in rows]
+
+    @property
+    def data(self):
+        with timed_serializer():
+            return ReturnList(super().data, serializer=self)
+
+
+class RowListMixin:
+    """
+    Read-optimized list action of a ViewSet: rows are fetched with values()
+    of the columns needed by serializer_class and converted by its RowEncoder
+    instead of building model instances and serializer fields per row
+    """
+
+    def row_encoder(self):
+        return get_row_encoder(self.get_serializer_class())
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.values(*self.row_encoder().columns)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action != 'list' or not kwargs.pop('many', False):
+            return super().get_serializer(*args, **kwargs)
+
+        kwargs.setdefault('context', self.get_serializer_context())
+        return RowListSerializer(*args, encoder=self.row_encoder(), **kwargs)
@@ -1,41 +1,111 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from auction.models import Auction, Region, Bid
+from auction.models import Auction, Region, Bid, ProxyBid, Settlement
+from auction.cache import region_cache
+from auction.metrics import timed_serializer
 
 
-class AuctionSerializer(serializers.ModelSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+
+    """ List serializer which reports serialization time to request metrics """
+
+    @property
+    def data(self):
+        with timed_serializer():
+            return super().data
+
+
+class TimedSerializerMixin:
+
+    """ Report serialization time to request metrics """
+
+    @property
+    def data(self):
+        with timed_serializer():
+            return super().data
+
+
+class CachedRegionField(serializers.PrimaryKeyRelatedField):
+
+    """ Region primary key field validated against region cache instead of database """
+
+    def to_internal_value(self, data):
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        name = region_cache.get(pk)
+        if name is None:
+            self.fail('does_not_exist', pk_value=data)
+        return Region(pk=pk, name=name)
+
+
+class SettlementSerializer(serializers.ModelSerializer):
+
+    """ Settlement model class serializer, nested into auctions """
+
+    class Meta:
+        model = Settlement
+        exclude = ['auction']
+
+
+class AuctionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     """ Auction model class serializer"""
 
-    current_price = serializers.SerializerMethodField()
-    
+    region = CachedRegionField(queryset=Region.objects.all())
+    photo_urls = serializers.SerializerMethodField()
+    # Result of the auction once it is closed, null before
+    settlement = SettlementSerializer(read_only=True)
+
     class Meta:
         model = Auction
-        fields = '__all__'
-        # exclude = ['duration_timedelta']
+        exclude = ['photo_renditions']
+        list_serializer_class = TimedListSerializer
         extra_kwargs = {'author': {'required': False}} 
+        read_only_fields = ['current_price', 'last_bid', 'leader', 'bid_count', 'version']
+
+    # Columns of method fields for the read-optimized list (auction.rows)
+    row_method_sources = {'photo_urls': ('photo', 'photo_renditions')}
+
+    def get_photo_urls(self, auction):
+        return self.get_photo_urls_row(auction.photo.name, auction.photo_renditions)
 
-    def get_current_price(self, obj):
-        return obj.current_price
+    def get_photo_urls_row(self, photo, renditions):
+        """ URL of every photo size, the original photo stands in for sizes not rendered yet """
+        if not photo:
+            return None
 
-class RegionSerializer(serializers.ModelSerializer):
+        request = self.context.get('request')
+        urls = {}
+        for size in settings.IMAGE_SIZES:
+            url = default_storage.url(renditions.get(size) or photo)
+            urls[size] = request.build_absolute_uri(url) if request else url
+        return urls
+
+class RegionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     """ Region model class serializer"""
 
     class Meta:
         model = Region
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
         
 
-class BidSerializer(serializers.ModelSerializer):
+class BidSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     """ Bid model serializer"""
 
     class Meta:
         model = Bid
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
 
         extra_kwargs = {'author': {'required': False},
-                    'previous_bid': {'required': False},
+                    'previous_bid': {'required': False, 'validators': []},
                     'bid_time':{'required': False}
                         }
 
@@ -44,3 +114,14 @@ class BidSerializer(serializers.ModelSerializer):
         super().save(**kwargs)
         pass
     
+
+
+class ProxyBidSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+
+    """ Proxy bid model serializer"""
+
+    class Meta:
+        model = ProxyBid
+        fields = '__all__'
+        list_serializer_class = TimedListSerializer
+        read_only_fields = ['author']
@@ -0,0 +1,140 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ValidationError
+
+#Models
+from auction.models import Auction, Bid, ProxyBid
+from auction.serializers import BidSerializer
+
+#Event stream
+from auction.broker import publish_event
+
+
+class BidConflict(APIException):
+    """ Raised when a bid lost the race against a concurrent bid """
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Auction has received a newer bid, try again'
+    default_code = 'bid_conflict'
+
+
+def place_bid(auction, author, price, previous_bid=None):
+    """
+    Commit a bid to the auction.
+
+    The auction row is locked (SELECT ... FOR UPDATE) for the whole transaction,
+    so Bid.clean() validates against the current last bid and concurrent bidders
+    are serialized instead of colliding on the previous_bid unique constraint.
+    If previous_bid is given it must still be the last bid of the auction.
+    Proxy bids of other users answer the bid in the same transaction.
+    Accepted bids are pushed to auction stream subscribers after commit.
+    """
+
+    auction_id = auction.pk if isinstance(auction, Auction) else auction
+
+    try:
+        with transaction.atomic():
+            locked = Auction.objects.select_for_update().select_related('last_bid').get(pk=auction_id)
+
+            if locked.closed:
+                raise ValidationError('Auction is closed')
+            if previous_bid is not None and previous_bid.pk != locked.last_bid_id:
+                raise BidConflict()
+
+            bid = Bid(auction=locked, author=author, price=price, previous_bid=locked.last_bid)
+            bid.save()
+            publish_bids(locked, [bid] + resolve_proxies(locked))
+    except IntegrityError:
+        raise BidConflict()
+    except Auction.DoesNotExist:
+        raise ValidationError('Auction does not exist')
+
+    return bid
+
+
+def register_proxy(auction, author, max_price):
+    """
+    Create or change proxy bid of the author and let proxies answer
+    the current price right away. Return proxy and written bids
+    """
+
+    auction_id = auction.pk if isinstance(auction, Auction) else auction
+
+    with transaction.atomic():
+        try:
+            locked = Auction.objects.select_for_update().select_related('last_bid').get(pk=auction_id)
+        except Auction.DoesNotExist:
+            raise ValidationError('Auction does not exist')
+
+        if locked.author_id == author.pk:
+            raise ValidationError("Author of the lot can't bid")
+        if locked.closed or locked.end_time() < datetime.now(timezone.utc):
+            raise ValidationError("Auction is run out of time")
+        if max_price <= locked.current_price:
+            raise ValidationError('Maximum price has to exceed the current price')
+
+        proxy, _ = ProxyBid.objects.update_or_create(auction=locked, author=author, defaults={'max_price': max_price})
+        bids = resolve_proxies(locked)
+        publish_bids(locked, bids)
+
+    return proxy, bids
+
+
+def resolve_proxies(auction):
+    """
+    Answer the current price of the locked auction with proxy bids.
+
+    Highest proxy wins (earlier one on a tie) and pays PROXY_BID_INCREMENT over
+    the second highest proxy or the current price, never more than its maximum.
+    Instead of replaying the whole bidding war only the resulting bids are written:
+    the exhausted runner-up at its maximum (unless it is leading already) and the winner.
+    Bids go through Bid.save(), so Bid.clean() rules hold. Return written bids
+    """
+
+    if auction.closed or auction.end_time() < datetime.now(timezone.utc):
+        return []
+
+    increment = settings.PROXY_BID_INCREMENT
+    price = auction.current_price
+    proxies = (ProxyBid.objects.filter(auction=auction, max_price__gte=price)
+               .exclude(author=auction.author_id).order_by('-max_price', 'created_at', 'pk'))
+
+    # Leader only has to hold the current price, others have to beat it
+    eligible = [proxy for proxy in proxies
+                if proxy.author_id == auction.leader_id or proxy.max_price >= price + increment]
+    if not eligible:
+        return []
+
+    winner, runner_up = eligible[0], (eligible[1] if len(eligible) > 1 else None)
+    bids = []
+
+    if winner.author_id == auction.leader_id:
+        if runner_up is None:
+            return []
+        bids.append(proxy_bid(auction, runner_up, runner_up.max_price))
+        bids.append(proxy_bid(auction, winner, min(winner.max_price, runner_up.max_price + increment)))
+        return bids
+
+    floor = price
+    if runner_up is not None:
+        if runner_up.author_id != auction.leader_id:
+            bids.append(proxy_bid(auction, runner_up, runner_up.max_price))
+        floor = max(price, runner_up.max_price)
+    bids.append(proxy_bid(auction, winner, min(winner.max_price, floor + increment)))
+    return bids
+
+
+def proxy_bid(auction, proxy, price):
+    bid = Bid(auction=auction, author_id=proxy.author_id, price=round(price, 2), previous_bid=auction.last_bid)
+    bid.save()
+    return bid
+
+
+def publish_bids(auction, bids):
+    for bid in bids:
+        publish_event(auction.pk, 'bid', JSONRenderer().render(BidSerializer(bid).data).decode())
@@ -0,0 +1,138 @@
+import asyncio
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+
+from auction.broker import auction_channel, decode_event, get_broker
+
+
+STREAM_PATH = re.compile(r'^/auction/(?P<pk>\d+)/stream$')
+HEARTBEAT_SECONDS = 15
+
+
+class AuctionStreamApplication:
+    """
+    ASGI application pushing events of one auction to clients:
+    - Server-Sent Events on GET /auction/<pk>/stream
+    - WebSocket on /auction/<pk>/stream
+    Events are `bid` (serialized bid) and `closed`.
+    JWT access token is taken from `Authorization: Bearer` header or `?token=`,
+    unknown auctions get 404 (WebSocket close code 4404).
+    Every other request goes to Django application
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        match = STREAM_PATH.match(scope.get('path', '')) if scope['type'] in ('http', 'websocket') else None
+        if match is None:
+            return await self.application(scope, receive, send)
+
+        channel = auction_channel(match['pk'])
+        status = await self.check(scope, match['pk'])
+
+        if scope['type'] == 'websocket':
+            return await self.websocket(channel, status, receive, send)
+        return await self.event_stream(channel, status, scope, receive, send)
+
+    @staticmethod
+    @sync_to_async
+    def check(scope, auction_id):
+        """ Return 200 for a valid token and existing auction, 401 or 404 otherwise """
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from auction.authentication import CachedJWTAuthentication
+        from auction.models import Auction
+
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+        for name, value in scope.get('headers', []):
+            if name == b'authorization' and value.startswith(b'Bearer '):
+                token = value[len(b'Bearer '):].decode()
+
+        try:
+            CachedJWTAuthentication().get_user(AccessToken(token))
+        except (TokenError, TypeError, InvalidToken, AuthenticationFailed):
+            return 401
+        return 200 if Auction.objects.filter(pk=auction_id).exists() else 404
+
+    async def event_stream(self, channel, status, scope, receive, send):
+        if status == 200 and scope['method'] != 'GET':
+            status = 405
+        if status != 200:
+            await send({'type': 'http.response.start', 'status': status, 'headers': []})
+            return await send({'type': 'http.response.body', 'body': b''})
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+
+        async def push(event, data):
+            body = f'event: {event}\ndata: {data}\n\n'.encode()
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        async def heartbeat():
+            await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+
+        await self.relay(channel, receive, push, heartbeat, 'http.disconnect')
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def websocket(self, channel, status, receive, send):
+        if (await receive())['type'] != 'websocket.connect':
+            return
+        if status != 200:
+            return await send({'type': 'websocket.close', 'code': 4000 + status})
+
+        await send({'type': 'websocket.accept'})
+
+        async def push(event, data):
+            await send({'type': 'websocket.send', 'text': f'{{"event":"{event}","data":{data}}}'})
+
+        async def heartbeat():
+            pass
+
+        if await self.relay(channel, receive, push, heartbeat, 'websocket.disconnect'):
+            await send({'type': 'websocket.close', 'code': 1000})
+
+    @staticmethod
+    async def relay(channel, receive, push, heartbeat, disconnect):
+        """
+        Forward broker messages of the channel to client until it disconnects
+        or the auction is closed.
+        Return True if the auction was closed
+        """
+        async def wait_disconnect():
+            while (await receive())['type'] != disconnect:
+                pass
+
+        disconnected = asyncio.ensure_future(wait_disconnect())
+
+        async with get_broker().subscribe(channel) as queue:
+            try:
+                while not disconnected.done():
+                    message = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait({message, disconnected}, timeout=HEARTBEAT_SECONDS,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if message not in done:
+                        message.cancel()
+                        if not done:
+                            await heartbeat()
+                        continue
+
+                    event, data = decode_event(message.result())
+                    await push(event, data)
+                    if event == 'closed':
+                        return True
+            finally:
+                disconnected.cancel()
+
+        return False
@@ -1,13 +1,53 @@
 #Django & DRF
 from rest_framework import status
 from django.urls import reverse
-from django.test import TestCase
-from rest_framework.test import APITestCase
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.core.management import call_command
+from django.conf import settings
+from django.test import override_settings
+from django.db import connection
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.request import Request
+from rest_framework.parsers import MultiPartParser
+from rest_framework.serializers import ValidationError
+from rest_framework_simplejwt.tokens import AccessToken
 
 #Models
-from auction.models import User, Auction, Bid, Region
+from auction.models import User, Auction, Bid, IdempotencyKey, Region, RegionStatistic, Settlement
+from auction.pagination import KeysetPagination
+from auction.services import place_bid
+from auction.broker import auction_channel, decode_event, encode_event, get_broker
+from auction.stream import AuctionStreamApplication
+from auction_backend.asgi import django_application
+from auction.cache import region_cache, user_cache
+from auction.loadtest import AsgiTransport, compare as compare_loadtest, summary as summary_loadtest
+from auction.metrics import registry as metrics_registry
+from auction.routers import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from auction.throttling import CacheBucketStore, InProcessBucketStore
+from auction.idempotency import request_fingerprint
+from auction.views import AuctionViewSet
+from auction.rows import RowListMixin
+from auction.renderers import FastJSONRenderer
+from auction.permissions import IsAuthor
 
 #Other
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from PIL import Image
 from datetime import datetime, datetime, timezone, timedelta
 
 
@@ -22,6 +62,10 @@ class BaseTestCase(APITestCase):
     def setUp(self) -> None:
         self.user_one = User.objects.get(pk=1)
         self.user_two = User.objects.get(pk=2)
+        # Empty bid throttle buckets for every test
+        patcher = mock.patch('auction.throttling._store', InProcessBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
 
 class AuctionTestCase(BaseTestCase):
@@ -156,12 +200,1197 @@ class BidTestCase(BaseTestCase):
         })
         self.assertEqual(response1.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_bid_with_outdated_previous_bid(self):
+        url = reverse('bid-list')
+        self.client.force_authenticate(user = self.user_two)
+        first = self.client.post(url, data={
+                "price": 100,
+                "auction": 1001
+        })
+        self.client.force_authenticate(user = User.objects.create_user('third@example.com'))
+        self.client.post(url, data={
+                "price": 110,
+                "auction": 1001
+        })
+        self.client.force_authenticate(user = self.user_two)
+        response = self.client.post(url, data={
+                "price": 120,
+                "auction": 1001,
+                "previous_bid": first.data['id']
+        })
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
 
+    def test_bid_updates_auction_price(self):
+        self.client.force_authenticate(user = self.user_two)
+        response = self.client.post(reverse('bid-list'), data={
+                "price": 150,
+                "auction": 1001
+        })
+        response = self.client.get(reverse('auction-detail', args=[1001]))
+        self.assertEqual(response.data['current_price'], 150)
+        self.assertEqual(response.data['leader'], self.user_two.pk)
+        self.assertEqual(response.data['bid_count'], 1)
 
-    
+    def test_filter_and_order_by_price(self):
+        self.client.force_authenticate(user = self.user_two)
+        self.client.post(reverse('bid-list'), data={
+                "price": 150,
+                "auction": 1001
+        })
+        response = self.client.get(reverse('auction-list'), data={'min_price': 120})
+        self.assertEqual([a['id'] for a in response.data['results']], [1001])
 
-    
+        response = self.client.get(reverse('auction-list'), data={'ordering': '-price'})
+        self.assertEqual(response.data['results'][0]['id'], 1001)
+
+    def test_refresh_bid_summary_command(self):
+        Auction.objects.filter(pk=1).update(current_price=0.0, last_bid=None, leader=None, bid_count=0)
+        self.assertEqual(Auction.objects.stale().count(), 1)
+
+        call_command('refresh_bid_summary', stdout=StringIO())
+
+        self.assertEqual(Auction.objects.stale().count(), 0)
+        auction = Auction.objects.get(pk=1)
+        self.assertEqual(auction.current_price, 100.0)
+        self.assertEqual(auction.leader, self.user_two)
+
+
+
+class CursorPaginationTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        for pk in range(1001, 1006):
+            Auction.objects.create(
+                pk = pk,
+                cadnumber = "0000000000:00:000:0000",
+                size = pk % 2,
+                duration = 1,
+                start_date = datetime.now(timezone.utc),
+                author = self.user_one,
+                region = Region.objects.get(pk=1),
+            )
+
+    def walk(self, params):
+        self.client.force_authenticate(user = self.user_one)
+        response = self.client.get(reverse('auction-list'), data=dict(params, pagination='cursor'))
+        pages = [response.data]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(response.data)
+        return pages
+
+    @mock.patch.object(KeysetPagination, 'page_size', 2)
+    def test_cursor_pages_follow_ordering(self):
+        pages = self.walk({'ordering': '-size'})
+
+        ids = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(ids, [2, 1, 1005, 1003, 1001, 1004, 1002])
+        self.assertNotIn('count', pages[0])
+
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual(response.data['results'], pages[-2]['results'])
+
+    def test_page_number_is_default(self):
+        self.client.force_authenticate(user = self.user_one)
+        response = self.client.get(reverse('auction-list'))
+        self.assertEqual(response.data['count'], 7)
+
+    def test_price_alias_of_auctions_only(self):
+        self.client.force_authenticate(user = self.user_one)
+        response = self.client.get(reverse('auction-list'), data={'pagination': 'cursor', 'ordering': '-price'})
+        self.assertEqual([row['id'] for row in response.data['results']][:2], [2, 1])
+
+        # Bids have no price alias, unknown orderings fall back to cursor_ordering
+        for ordering in ('price', '-current_price', 'unknown'):
+            response = self.client.get(reverse('bid-list'), data={'pagination': 'cursor', 'ordering': ordering})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, ordering)
+            self.assertEqual([row['id'] for row in response.data['results']], [1, 2], ordering)
+
+
+class StatisticTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        # Fixtures are loaded without Auction.save(), build counters from scratch
+        call_command('reconcile_statistics', stdout=StringIO())
+        self.client.force_authenticate(user = self.user_one)
+
+    def get_statistic(self):
+        return self.client.get(reverse('auction-statistics')).data
+
+    def test_counters_follow_auctions_and_bids(self):
+        auction = Auction.objects.create(
+            cadnumber = "0000000000:00:000:0000",
+            size = 3,
+            duration = 1,
+            start_date = datetime.now(timezone.utc),
+            author = self.user_one,
+            region = Region.objects.get(pk=1),
+        )
+        data = self.get_statistic()
+        self.assertEqual(data['number_all_lots'], 3)
+        self.assertEqual(data['number_active_lots'], 3)
+        self.assertEqual(data['all_land_size'], 7.0)
+        self.assertEqual(data['auctions_with_no_bids'], 1)
+
+        self.client.force_authenticate(user = self.user_two)
+        self.client.post(reverse('bid-list'), data={"price": 300, "auction": auction.pk})
+        self.assertEqual(self.get_statistic()['auctions_with_no_bids'], 0)
+
+        Auction.objects.filter(pk__in=[1, auction.pk]).close()
+        data = self.get_statistic()
+        self.assertEqual(data['number_active_lots'], 1)
+        self.assertEqual(data['avg_land_price'], 200.0)
+
+    def test_reconcile_fixes_drift(self):
+        RegionStatistic.objects.filter(region_id=1).update(number_all_lots=42)
+        out = StringIO()
+        call_command('reconcile_statistics', stdout=out)
+        self.assertIn('Regions with drifted statistics: 1', out.getvalue())
+        self.assertEqual(self.get_statistic()['number_all_lots'], 2)
+
+    def test_by_region(self):
+        response = self.client.get(reverse('auction-statistics'), data={'by_region': 'true'})
+        self.assertEqual([row['region'] for row in response.data['regions']], [1, 2])
+
+
+class AuctionCloseTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        call_command('reconcile_statistics', stdout=StringIO())
+        self.open_auction = Auction.objects.create(
+            cadnumber = "0000000000:00:000:0000",
+            size = 1,
+            duration = 1,
+            start_date = datetime.now(timezone.utc),
+            author = self.user_one,
+            region = Region.objects.get(pk=1),
+        )
+
+    def test_ends_at_is_stored(self):
+        self.assertEqual(self.open_auction.ends_at, self.open_auction.start_date + timedelta(hours=1))
+
+    def test_close_expired_in_batches(self):
+        self.assertEqual(Auction.objects.close_expired(batch_size=1), 2)
+        self.assertEqual(Auction.objects.close_expired(batch_size=1), 0)
+        self.assertEqual(list(Auction.objects.filter(closed=False)), [self.open_auction])
+        self.assertEqual(RegionStatistic.objects.get(region_id=1).number_active_lots, 1)
+
+    def test_auctions_without_ends_at(self):
+        # Rows stored before ends_at was
+        Auction.objects.filter(pk__in=[2, self.open_auction.pk]).update(ends_at=None)
+        with self.assertRaisesMessage(ValidationError, 'Auction is run out of time'):
+            place_bid(2, User.objects.create_user('third@example.com'), 200)
+        place_bid(self.open_auction.pk, self.user_two, 10)
+
+        # Periodic pass leaves them to the one-off backfill
+        self.assertEqual(Auction.objects.close_expired(), 1)
+        self.assertEqual(Auction.objects.fill_ends_at(), 2)
+        self.assertEqual(Auction.objects.close_expired(), 1)
+        self.assertEqual(list(Auction.objects.filter(closed=False)), [self.open_auction])
+        self.assertEqual(Auction.objects.get(pk=self.open_auction.pk).ends_at, self.open_auction.ends_at)
+
+    def test_close_auctions_command(self):
+        out = StringIO()
+        call_command('close_auctions', stdout=out)
+        self.assertIn('closed=2', out.getvalue())
+
+    def test_audit_view(self):
+        self.client.force_authenticate(user = self.user_one)
+        response = self.client.post(reverse('auction-audit'))
+        self.assertEqual(response.data, {'closed': 2})
+
+
+class AuctionStreamTestCase(BaseTestCase):
+
+    def stream(self, token, *messages, auction_id=1):
+        app = AuctionStreamApplication(None)
+        sent = []
+
+        async def scenario():
+            async def receive():
+                await asyncio.sleep(10)
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {
+                'type': 'http',
+                'method': 'GET',
+                'path': f'/auction/{auction_id}/stream',
+                'query_string': f'token={token}'.encode(),
+                'headers': [],
+            }
+            task = asyncio.ensure_future(app(scope, receive, send))
+            await asyncio.sleep(0.1)
+            for message in messages:
+                get_broker().publish(auction_channel(1), message)
+            await asyncio.wait_for(task, 1)
+
+        # Checks of the stream run in this thread and see the test transaction
+        async_to_sync(scenario)()
+        return sent
+
+    def test_stream_pushes_bids_until_closed(self):
+        sent = self.stream(
+            AccessToken.for_user(self.user_one),
+            encode_event('bid', '{"price":150.0}'),
+            encode_event('closed', '{"auction":1}'),
+        )
+        self.assertEqual(sent[0]['status'], status.HTTP_200_OK)
+        self.assertEqual(
+            b''.join(message.get('body', b'') for message in sent),
+            b'event: bid\ndata: {"price":150.0}\n\nevent: closed\ndata: {"auction":1}\n\n'
+        )
+
+    def test_stream_requires_token(self):
+        sent = self.stream('invalid')
+        self.assertEqual(sent[0]['status'], status.HTTP_401_UNAUTHORIZED)
+
+    def test_unknown_auction(self):
+        sent = self.stream(AccessToken.for_user(self.user_one), auction_id=100)
+        self.assertEqual(sent[0]['status'], status.HTTP_404_NOT_FOUND)
+
+    def test_accepted_bid_is_published(self):
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        with mock.patch('auction.broker.get_broker') as broker, self.captureOnCommitCallbacks(execute=True):
+            place_bid(2, User.objects.create_user('third@example.com'), 150)
+
+        channel, message = broker.return_value.publish.call_args[0]
+        self.assertEqual(channel, 'auction_2')
+        self.assertEqual(decode_event(message)[0], 'bid')
+
+
+class ExportTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_authenticate(user = self.user_one)
+
+    def test_auction_csv_export(self):
+        response = self.client.get(reverse('auction-export', args=['csv']), data={'region': 2}, HTTP_ACCEPT='text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'cadnumber', 'size'])
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[1].split(',')[-3:], ['100.0', '2', '1'])
+
+    def test_bid_ndjson_export(self):
+        response = self.client.get(reverse('bid-export', args=['ndjson']), data={'auction': 2})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows, [{
+            'id': 2, 'auction': 2, 'price': 100.0, 'bid_time': '2022-06-10T19:34:00Z', 'author': 1, 'previous_bid': None
+        }])
+
+    def test_export_invalid_filter(self):
+        response = self.client.get(reverse('bid-export', args=['csv']), data={'from_time': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        call_command('reconcile_statistics', stdout=StringIO())
+        self.client.force_authenticate(user = self.user_one)
+
+    def post_ndjson(self, name, rows):
+        body = '\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+        return self.client.generic('POST', reverse(name), body, content_type='application/x-ndjson')
+
+    def test_import_auctions(self):
+        response = self.post_ndjson('auction-import', [
+            {"cadnumber": "0000000000:00:000:0001", "size": 2.5, "duration": 3, "region": 1},
+            {"cadnumber": "wrong", "size": 1, "duration": 1, "region": 1},
+            {"cadnumber": "0000000000:00:000:0002", "size": 1, "duration": 1, "region": 99},
+            "not json",
+        ])
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3, 4])
+
+        auction = Auction.objects.get(cadnumber="0000000000:00:000:0001")
+        self.assertEqual(auction.duration_timedelta, timedelta(hours=3))
+        self.assertEqual(auction.ends_at, auction.start_date + timedelta(hours=3))
+        self.assertEqual(RegionStatistic.objects.get(region_id=1).number_all_lots, 2)
+
+    def test_import_bids(self):
+        auction = Auction.objects.create(
+            cadnumber = "0000000000:00:000:0000",
+            size = 1,
+            duration = 1,
+            start_date = datetime.now(timezone.utc) - timedelta(minutes=30),
+            author = self.user_one,
+            region = Region.objects.get(pk=1),
+        )
+        third = User.objects.create_user('third@example.com')
+        start = auction.start_date
+        response = self.post_ndjson('bid-import', [
+            {"auction": auction.pk, "author": 2, "price": 10, "bid_time": (start + timedelta(minutes=1)).isoformat()},
+            {"auction": auction.pk, "author": third.pk, "price": 20, "bid_time": (start + timedelta(minutes=2)).isoformat()},
+            {"auction": auction.pk, "author": third.pk, "price": 30, "bid_time": (start + timedelta(minutes=3)).isoformat()},
+            {"auction": auction.pk, "author": 1, "price": 40, "bid_time": (start + timedelta(minutes=4)).isoformat()},
+        ])
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4])
+
+        first, second = auction.bid_set.order_by('bid_time')
+        self.assertIsNone(first.previous_bid)
+        self.assertEqual(second.previous_bid, first)
+        auction.refresh_from_db()
+        self.assertEqual((auction.current_price, auction.bid_count, auction.leader), (20, 2, third))
+
+    def test_import_requires_staff(self):
+        self.client.force_authenticate(user = self.user_two)
+        response = self.post_ndjson('auction-import', [])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ConditionalGetTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_authenticate(user = self.user_one)
+
+    def test_detail_not_modified(self):
+        url = reverse('auction-detail', args=[2])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        place_bid(2, User.objects.create_user('third@example.com'), 150)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_not_modified(self):
+        url = reverse('auction-list')
+        # Collection version is read only for requests sending a validator
+        with self.assertNumQueries(2):
+            self.assertNotIn('ETag', self.client.get(url, data={'region': 1}))
+        etag = self.client.get(url, data={'region': 1}, HTTP_IF_NONE_MATCH='"none"')['ETag']
+
+        # Version comes from the shared cache
+        with self.assertNumQueries(0):
+            response = self.client.get(url, data={'region': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, data={'region': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Writes of another region keep the list of region 1, versions are bumped after commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Auction.objects.filter(region=2).close()
+        response = self.client.get(url, data={'region': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(2, User.objects.create_user('third@example.com'), 150)
+        response = self.client.get(url, data={'region': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Auction.objects.filter(pk=2).close()
+        response = self.client.get(url, data={'region': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_bid_does_not_write_region_row(self):
+        # Auction 2 has bids already, counters of its region don't change
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        with CaptureQueriesContext(connection) as queries:
+            place_bid(2, User.objects.create_user('third@example.com'), 150)
+        self.assertFalse([query for query in queries if 'regionstatistic' in query['sql']])
+
+    def test_list_error_has_no_etag(self):
+        response = self.client.get(reverse('auction-list'), data={'region': 99}, HTTP_IF_NONE_MATCH='"none"')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('ETag', response)
+
+
+class RegionCacheTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_authenticate(user = self.user_one)
+        region_cache.all()
+
+    def test_region_list_from_memory(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('region-list'))
+        self.assertEqual(response.data['count'], 3)
+
+    def test_region_write_invalidates_cache(self):
+        response = self.client.post(reverse('region-list'), data={'name': 'Lviv'})
+        region_id = response.data['id']
+
+        response = self.client.get(reverse('auction-list'), data={'region': region_id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(reverse('auction-list'), data={
+            "cadnumber": "0000000000:00:000:0000",
+            "size": 2.0,
+            "duration": 1,
+            "region": region_id
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.delete(reverse('region-detail', args=[region_id]))
+        self.assertIsNone(region_cache.get(region_id))
+
+    def test_unknown_region(self):
+        response = self.client.get(reverse('auction-list'), data={'region': 99})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_by_region_name(self):
+        names = region_cache.all()
+        response = self.client.get(reverse('auction-list'), data={'ordering': '-region__name'})
+        ordered = [names[row['region']] for row in response.data['results']]
+        self.assertEqual(ordered, sorted(ordered, reverse=True))
+
+
+class LadderTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.auction = Auction.objects.create(
+            cadnumber = "0000000000:00:000:0000",
+            size = 1,
+            duration = 1,
+            start_date = datetime.now(timezone.utc),
+            author = self.user_one,
+            region = Region.objects.get(pk=1),
+        )
+        self.third = User.objects.create_user('third@example.com')
+        self.bids = [
+            place_bid(self.auction, author, price)
+            for author, price in ((self.user_two, 100), (self.third, 150), (self.user_two, 170))
+        ]
+
+    def test_ladder(self):
+        self.client.force_authenticate(user = self.user_one)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('auction-ladder', args=[self.auction.pk]), data={'top': 1})
+
+        self.assertEqual([bid['increment'] for bid in response.data['bids']], [None, 50, 20])
+        self.assertEqual([bid['bidder_rank'] for bid in response.data['bids']], [1, 2, 1])
+        self.assertIsNone(response.data['bids'][0]['time_gap'])
+        self.assertGreaterEqual(response.data['bids'][1]['time_gap'], 0)
+        self.assertEqual(response.data['top_bidders'], [
+            {'author': self.user_two.pk, 'best_price': 170, 'bids': 2, 'rank': 1}
+        ])
+
+    def test_delete_relinks_chain(self):
+        first, second, third = self.bids
+        second.delete()
+
+        third.refresh_from_db()
+        self.assertEqual(third.previous_bid, first)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.bid_count, 2)
+
+
+@override_settings(METRICS_DIR=tempfile.mkdtemp(), METRICS_FLUSH_INTERVAL=0)
+class MetricsTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        # Drop values recorded by other tests of this process
+        patcher = mock.patch.object(metrics_registry, '_values', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_and_metrics(self):
+        self.client.force_authenticate(user = self.user_one)
+        response = self.client.get(reverse('auction-list'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, total;dur=[\d.]+')
+
+        # Values of another worker are summed
+        with open(os.path.join(settings.METRICS_DIR, 'metrics-0.json'), 'w') as file:
+            json.dump([['auction_db_queries_total', [['view', 'AuctionViewSet'], ['action', 'list'], ['method', 'GET']], 10]], file)
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        labels = '{view="AuctionViewSet",action="list",method="GET"}'
+        self.assertIn(f'auction_request_duration_seconds_count{labels} 1', metrics)
+        queries = re.search(r'auction_db_queries_total' + re.escape(labels) + r' ([\d.]+)', metrics)
+        self.assertGreater(float(queries.group(1)), 10)
+
+    def test_metrics_for_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user = self.user_two)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        # No timings for clients unless SERVER_TIMING is on
+        self.assertNotIn('Server-Timing', response)
+
+
+class LoadTestCompareTestCase(TestCase):
+
+    def test_compare_flags_regressions(self):
+        baseline = {'scenarios': {'list': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'throughput_rps': 100, 'errors': 0}}}
+        current = {'scenarios': {'list': {'p50_ms': 10.5, 'p95_ms': 25, 'p99_ms': 30, 'throughput_rps': 80, 'errors': 1}}}
+
+        self.assertEqual(compare_loadtest(baseline, current, 0.1), [
+            'list: p95_ms 20 -> 25',
+            'list: throughput_rps 100 -> 80',
+            'list: errors 0 -> 1',
+        ])
+        self.assertEqual(compare_loadtest(baseline, baseline, 0.1), [])
+
+    def test_compare_flags_throttled_bids(self):
+        baseline = {'scenarios': {'bid_hot': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'throughput_rps': 100, 'errors': 0}}}
+        # Fast 429s, latencies look fine
+        current = {'scenarios': {'bid_hot': dict(baseline['scenarios']['bid_hot'], p50_ms=2, throttled=350)}}
+        self.assertEqual(compare_loadtest(baseline, current, 0.1), ['bid_hot: throttled 0 -> 350'])
+
+    def test_no_completed_requests(self):
+        result = summary_loadtest([], {}, 0.5)
+        self.assertEqual((result['requests'], result['p50_ms'], result['p95_ms'], result['p99_ms']), (0, None, None, None))
+
+        baseline = {'scenarios': {'list': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'throughput_rps': 100, 'errors': 0}}}
+        self.assertEqual(compare_loadtest(baseline, {'scenarios': {'list': result}}, 0.1), ['list: throughput_rps 100 -> 0.0'])
+        self.assertEqual(compare_loadtest({'scenarios': {'list': result}}, baseline, 0.1), [])
+
+    def test_command_turns_throttle_off(self):
+        output = tempfile.NamedTemporaryFile(suffix='.json')
+        self.addCleanup(output.close)
+        call_command('loadtest', scenario=['bid_hot'], concurrency=2, requests=10, auctions=5,
+                     output=output.name, stdout=StringIO(), stderr=StringIO())
+        report = json.load(output)
+        self.assertEqual(report['meta']['bid_throttle_rate'], 0)
+        self.assertEqual(report['scenarios']['bid_hot']['throttled'], 0)
+
+
+class SeedDataTestCase(TestCase):
+
+    def seed(self, seed):
+        call_command('seed_data', auctions=50, bids=400, regions=5, users=20, seed=seed,
+                     anchor=datetime(2022, 6, 1, tzinfo=timezone.utc), stdout=StringIO(), stderr=StringIO())
+        return list(Bid.objects.order_by('id').values_list('auction_id', 'author_id', 'price', 'bid_time'))
+
+    def test_seed_is_deterministic_and_consistent(self):
+        bids = self.seed(7)
+        self.assertGreater(len(bids), 300)
+        self.assertEqual(Auction.objects.stale().count(), 0)
+        self.assertFalse(Bid.objects.filter(previous_bid__author=F('author')).exists())
+        self.assertFalse(Bid.objects.filter(previous_bid__price__gte=F('price')).exists())
+        self.assertEqual(Bid.objects.filter(previous_bid__isnull=True).count(), Auction.objects.filter(bid_count__gt=0).count())
+
+        Bid.objects.all().delete()
+        Auction.objects.all().delete()
+        self.assertEqual([bid[1:] for bid in self.seed(7)], [bid[1:] for bid in bids])
+
+
+class CachedAuthenticationTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        user_cache.clear()
+        self.user_one.set_password('secret-password')
+        self.user_one.save()
+
+    def obtain_token(self):
+        response = self.client.post(reverse('jwt-create'), {'email': self.user_one.email, 'password': 'secret-password'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    def test_user_is_not_loaded_on_every_request(self):
+        self.obtain_token()
+        self.client.get(reverse('auction-detail', args=[1]))
+
+        # Permission check compares author ids, no user row is read
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(reverse('auction-detail', args=[2]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse([query for query in queries if 'auction_user' in query['sql']])
+
+    def test_cached_user_keeps_its_fields(self):
+        user_cache.load(self.user_two.pk)
+        user = user_cache.build(user_cache.get(self.user_two.pk))
+        self.assertEqual((user.pk, user.email, user.is_active, user.is_staff, user.token_version),
+                         (2, self.user_two.email, True, False, 1))
+
+    def test_password_change_and_deactivation_revoke_tokens(self):
+        self.obtain_token()
+        self.assertEqual(self.client.get(reverse('auction-detail', args=[1])).status_code, status.HTTP_200_OK)
+
+        self.user_one.set_password('another-password')
+        self.user_one.save()
+        self.assertEqual(self.client.get(reverse('auction-detail', args=[1])).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user_one.set_password('secret-password')
+        self.user_one.save()
+        self.obtain_token()
+        self.assertEqual(self.client.get(reverse('auction-detail', args=[1])).status_code, status.HTTP_200_OK)
+
+        self.user_one.is_active = False
+        self.user_one.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get(reverse('auction-detail', args=[1])).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PhotoPipelineTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name, IMAGE_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client.force_authenticate(user = self.user_one)
+
+    def upload(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 900), 'green').save(buffer, 'JPEG')
+        buffer.seek(0)
+        buffer.name = 'plot.jpg'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('auction-list'), data={
+                'photo': buffer,
+                'cadnumber': '0000000000:00:000:0000',
+                'size': 2.0,
+                'duration': 1,
+                'region': 1,
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_sizes_are_rendered_and_exposed(self):
+        pk = self.upload()
+        auction = Auction.objects.get(pk=pk)
+        self.assertEqual(set(auction.photo_renditions), set(settings.IMAGE_SIZES))
+
+        with Image.open(os.path.join(settings.MEDIA_ROOT, auction.photo_renditions['thumbnail'])) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (320, 180)))
+
+        response = self.client.get(reverse('auction-detail', args=[pk]))
+        self.assertTrue(response.data['photo_urls']['detail'].endswith('-detail.webp'))
+        self.assertNotIn('photo_renditions', response.data)
+        self.assertIsNone(self.client.get(reverse('auction-detail', args=[1])).data['photo_urls'])
+
+    def test_replaced_photo_drops_renditions(self):
+        auction = Auction.objects.get(pk=self.upload())
+        outdated = auction.photo_renditions
+
+        with self.captureOnCommitCallbacks(execute=True):
+            auction.photo = ''
+            auction.save()
+
+        self.assertEqual(Auction.objects.get(pk=auction.pk).photo_renditions, {})
+        self.assertFalse(any(os.path.exists(os.path.join(settings.MEDIA_ROOT, name)) for name in outdated.values()))
+
+
+class CadnumberSearchTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_authenticate(user = self.user_one)
+
+    def search(self, **params):
+        response = self.client.get(reverse('auction-list'), params)
+        if response.status_code != status.HTTP_200_OK:
+            return response.status_code
+        return [auction['id'] for auction in response.data['results']]
+
+    def test_search_by_cadastral_parts(self):
+        self.assertEqual(self.search(cadnumber='3222485201:02:003:0042'), [2])
+        self.assertEqual(self.search(koatuu='322'), [1, 2])
+        self.assertEqual(self.search(koatuu='32208'), [1])
+        self.assertEqual(self.search(zone='02', quarter='003'), [2])
+        self.assertEqual(self.search(koatuu='3220', zone='02'), [])
+        self.assertEqual(self.search(koatuu='32a'), status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search(cadnumber='3222485201:02:003'), status.HTTP_400_BAD_REQUEST)
+
+    def test_parts_follow_cadnumber(self):
+        auction = Auction.objects.get(pk=1)
+        auction.cadnumber = '4610100000:05:007:0123'
+        auction.save(update_fields=['cadnumber'])
+        self.assertEqual(self.search(koatuu='461', zone='05', quarter='007'), [1])
+
+        Auction.objects.update(cad_koatuu='', cad_zone='', cad_quarter='', cad_parcel='')
+        self.assertEqual(Auction.objects.parse_cadnumbers(), 2)
+        self.assertEqual(self.search(cadnumber='3222485201:02:003:0042'), [2])
+
+
+class AsyncReadTestCase(TransactionTestCase):
+    """ Database queries of async views run in other threads, so data has to be committed """
+
+    fixtures = BaseTestCase.fixtures
+
+    def setUp(self) -> None:
+        self.token = f'Bearer {AccessToken.for_user(User.objects.get(pk=1))}'
+
+    def get(self, path, **extra):
+        with override_settings(ROOT_URLCONF='auction_backend.urls_asgi'):
+            response = async_to_sync(self.async_client.get)(path, AUTHORIZATION=self.token, **extra)
+        sync_response = self.client.get(path, HTTP_AUTHORIZATION=self.token)
+        return response, sync_response
+
+    def test_async_views_answer_like_sync_views(self):
+        for path in ('/auction/?ordering=-price', '/auction/1', '/bid/?auction=1', '/auction/statistic?by_region=true',
+                     '/auction/?pagination=cursor&koatuu=322'):
+            response, sync_response = self.get(path)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+            self.assertEqual(response.content, sync_response.content, path)
+            self.assertEqual(response.get('ETag'), sync_response.get('ETag'), path)
+
+    def test_conditional_get_and_errors(self):
+        response, _ = self.get('/auction/1')
+        not_modified, _ = self.get('/auction/1', **{'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response, _ = self.get('/auction/?region=1', **{'if-none-match': '"none"'})
+        not_modified, _ = self.get('/auction/?region=1', **{'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        missing, _ = self.get('/auction/100')
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.token = ''
+        anonymous, _ = self.get('/auction/')
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_one_connection_per_request(self):
+        # Every pool call takes a connection and releases it (close_old_connections before and after)
+        for path in ('/auction/', '/auction/1', '/bid/?auction=1', '/auction/statistic'):
+            with mock.patch('auction.async_views.close_old_connections') as close_old_connections:
+                response, _ = self.get(path)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+            self.assertEqual(close_old_connections.call_count, 2, path)
+
+    def test_transport_sends_post_body(self):
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        user = User.objects.create_user('third@example.com')
+        transport = AsgiTransport(AccessToken.for_user(user), AuctionStreamApplication(django_application))
+
+        status_code = async_to_sync(transport.request)('post', '/bid/', {'auction': 2, 'price': 200})
+        self.assertEqual(status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Bid.objects.filter(auction=2, author=user).exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_CACHE='sticky')
+class ReplicaRoutingTestCase(SimpleTestCase):
+
+    def setUp(self) -> None:
+        # Marks are kept in a cache every worker of the host can read
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = override_settings(CACHES=dict(settings.CACHES, sticky={
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name,
+        }))
+        shared.enable()
+        self.addCleanup(shared.disable)
+
+    def route(self, method, user_id=None, status_code=200):
+        """ Return database of reads inside a request """
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(User(pk=user_id))}'} if user_id else {}
+        request = RequestFactory().generic(method, '/auction/', **headers)
+        reads = []
+
+        def view(request):
+            reads.append(PrimaryReplicaRouter().db_for_read(Auction))
+            return HttpResponse(status=status_code)
+
+        ReplicaRoutingMiddleware(view)(request)
+        return reads[0]
+
+    def test_reads_of_safe_requests_go_to_replica(self):
+        self.assertEqual(self.route('GET', 1), 'replica')
+        self.assertEqual(self.route('HEAD'), 'replica')
+        self.assertEqual(self.route('POST', 1), 'default')
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Auction), 'default')
+        self.assertEqual(PrimaryReplicaRouter().db_for_write(Auction), 'default')
+
+    def test_writer_sticks_to_primary(self):
+        self.route('POST', 1, status_code=400)
+        self.assertEqual(self.route('GET', 1), 'replica')
+
+        self.route('POST', 1, status_code=201)
+        self.assertEqual(self.route('GET', 1), 'default')
+        self.assertEqual(self.route('GET', 2), 'replica')
+
+        with override_settings(REPLICA_STICKY_SECONDS=0.01):
+            self.route('DELETE', 2, status_code=204)
+            self.assertEqual(self.route('GET', 2), 'default')
+            time.sleep(0.02)
+            self.assertEqual(self.route('GET', 2), 'replica')
+
+    def test_marks_go_through_configured_cache(self):
+        self.route('POST', 1, status_code=201)
+        self.assertTrue(caches['sticky'].get(ReplicaRoutingMiddleware.sticky_key(1)))
+        self.assertIsNone(cache.get(ReplicaRoutingMiddleware.sticky_key(1)))
+
+        # Another worker reads the mark from the same cache
+        caches['sticky'].set(ReplicaRoutingMiddleware.sticky_key(2), True)
+        self.assertEqual(self.route('GET', 2), 'default')
+
+    def test_process_local_cache_is_refused(self):
+        with override_settings(REPLICA_STICKY_CACHE='default'):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+
+class CacheReadsPrimaryTestCase(BaseTestCase):
+
+    def test_caches_load_from_primary(self):
+        # Reads routed to the unknown 'replica' alias fail
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', lambda router, model, **hints: 'replica'):
+            region_cache.invalidate()
+            self.assertEqual(region_cache.get(1), 'Region 1')
+            self.assertEqual(user_cache.load(self.user_one.pk)['email'], self.user_one.email)
+
+
+class ProxyBidTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        self.third = User.objects.create_user('third@example.com')
+        self.fourth = User.objects.create_user('fourth@example.com')
+
+    def register(self, user, max_price):
+        self.client.force_authenticate(user = user)
+        return self.client.post(reverse('proxy-list'), {'auction': 2, 'max_price': max_price})
+
+    def history(self):
+        return list(Bid.objects.filter(auction=2, pk__gt=2).order_by('pk').values_list('author', 'price'))
+
+    def test_proxies_answer_bids(self):
+        self.assertEqual(self.register(self.third, 300).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.history(), [(3, 101)])
+
+        # Runner-up proxy is exhausted, leader pays one increment over it
+        self.register(self.user_one, 250)
+        self.assertEqual(self.history()[1:], [(1, 250), (3, 251)])
+
+        place_bid(2, self.fourth, 280)
+        self.assertEqual(self.history()[3:], [(4, 280), (3, 281)])
+
+        place_bid(2, self.fourth, 400)
+        self.assertEqual(self.history()[5:], [(4, 400)])
+
+        # Raised maximum answers right away
+        response = self.register(self.user_one, 500)
+        self.assertEqual((response.status_code, response.data['max_price']), (status.HTTP_201_CREATED, 500))
+        self.assertEqual(self.history()[6:], [(1, 401)])
+
+        auction = Auction.objects.get(pk=2)
+        self.assertEqual((auction.current_price, auction.leader_id, auction.bid_count), (401, 1, 8))
+        self.assertEqual(Auction.objects.stale().count(), 0)
+        self.assertEqual([proxy['max_price'] for proxy in self.client.get(reverse('proxy-list')).data['results']], [500])
+
+    def test_proxy_follows_bid_rules(self):
+        self.assertEqual(self.register(self.user_two, 300).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.register(self.third, 100).status_code, status.HTTP_400_BAD_REQUEST)
+
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+        self.assertEqual(self.register(self.third, 300).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.history(), [])
+
+
+class SettlementTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        call_command('reconcile_statistics', stdout=StringIO())
+        self.client.force_authenticate(user = self.user_one)
+        self.unsold = Auction.objects.create(
+            cadnumber = "0000000000:00:000:0000",
+            size = 4,
+            duration = 1,
+            start_date = datetime.now(timezone.utc) - timedelta(hours=2),
+            author = self.user_one,
+            region = Region.objects.get(pk=1),
+        )
+
+    def test_close_settles_auctions(self):
+        # Settlement is a single INSERT ... SELECT, queries depend on number of regions only
+        with self.assertNumQueries(10):
+            self.assertEqual(Auction.objects.close_expired(), 3)
+
+        self.assertEqual(list(Settlement.objects.order_by('auction').values_list(
+            'auction', 'winner', 'final_price', 'price_per_hectare', 'bid_count', 'no_bids')), [
+            (1, 2, 100.0, 50.0, 1, False),
+            (2, 1, 100.0, 50.0, 1, False),
+            (self.unsold.pk, None, None, None, 0, True),
+        ])
+        response = self.client.get(reverse('auction-detail', args=[1]))
+        self.assertEqual(response.data['settlement']['final_price'], 100.0)
+        self.assertIsNone(self.client.get(reverse('auction-detail', args=[self.unsold.pk])).data['settlement']['winner'])
+
+    def test_statistics_keep_settled_price(self):
+        Auction.objects.close_expired()
+        # Bid removed after closing doesn't change the result
+        Bid.objects.get(pk=1).delete()
+        self.assertEqual(Settlement.objects.get(auction=1).final_price, 100.0)
+
+        statistic = self.client.get(reverse('auction-statistics')).data
+        self.assertEqual((statistic['avg_land_price'], statistic['auctions_with_no_bids']), (100.0, 1))
+        out = StringIO()
+        call_command('reconcile_statistics', '--check', stdout=out)
+        self.assertIn('Regions with drifted statistics: 0', out.getvalue())
+
+    def test_patch_close_and_reopen(self):
+        response = self.client.patch(reverse('auction-detail', args=[self.unsold.pk]), {'closed': True})
+        self.assertTrue(response.data['settlement']['no_bids'])
+
+        response = self.client.patch(reverse('auction-detail', args=[self.unsold.pk]), {'closed': False})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(ValidationError):
+            Settlement.objects.get(auction=self.unsold.pk).save()
+
+    def test_no_bids_after_close(self):
+        # Closed early, ends_at is still ahead
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        Auction.objects.filter(pk=2).close()
+        auction = Auction.objects.get(pk=2)
+        bidder = User.objects.create_user('third@example.com')
+
+        self.client.force_authenticate(user = bidder)
+        response = self.client.post(reverse('bid-list'), data={'auction': 2, 'price': 150})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(ValidationError):
+            place_bid(2, bidder, 200)
+
+        auction.refresh_from_db()
+        self.assertEqual((auction.current_price, auction.bid_count), (100.0, 1))
+        self.assertEqual(Settlement.objects.get(auction=2).final_price, auction.current_price)
+
+    def test_backfill_and_export(self):
+        Auction.objects.filter(pk=1).update(closed=True)
+        out = StringIO()
+        call_command('close_auctions', '--settle', stdout=out)
+        self.assertIn('Settled closed auctions: 1', out.getvalue())
+
+        response = self.client.get(reverse('auction-export', args=['ndjson']), data={'region': 2})
+        row = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((row['final_price'], row['price_per_hectare'], row['winner']), (100.0, 50.0, 2))
+
+
+@override_settings(BID_THROTTLE_RATE=0.5, BID_THROTTLE_BURST=2)
+class BidThrottleTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        patcher = mock.patch.object(metrics_registry, '_values', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_authenticate(user = User.objects.create_user('third@example.com'))
+
+    def bid(self, price, auction=2):
+        return self.client.post(reverse('bid-list'), data={'auction': auction, 'price': price})
+
+    def test_excess_attempts_rejected_before_database(self):
+        self.assertEqual(self.bid(200).status_code, status.HTTP_201_CREATED)
+        # Same author twice in a row, rejected by validation but still takes a token
+        self.assertEqual(self.bid(300).status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.assertNumQueries(0):
+            response = self.bid(400)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(metrics_registry._values[('auction_throttled_total', (('scope', 'bid'),))], 1)
+
+        # Buckets are per auction
+        self.assertNotEqual(self.bid(400, auction=1).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_tokens_come_back(self):
+        store = InProcessBucketStore()
+        with mock.patch('time.monotonic', return_value=100.0):
+            self.assertEqual([store.take('key', 0.5, 2) for _ in range(3)], [0, 0, 2.0])
+        with mock.patch('time.monotonic', return_value=101.0):
+            self.assertEqual(store.take('key', 0.5, 2), 1.0)
+        with mock.patch('time.monotonic', return_value=102.0):
+            self.assertEqual(store.take('key', 0.5, 2), 0)
+
+    @override_settings(BID_THROTTLE_STORE='auction.throttling.CacheBucketStore', BID_THROTTLE_CACHE='throttle')
+    def test_shared_store(self):
+        # File based cache stands in for a shared one, its incr is atomic per process only
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = CacheBucketStore()
+        with override_settings(CACHES=dict(settings.CACHES, throttle={
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name,
+        })), mock.patch('auction.throttling._store', store):
+            with mock.patch('time.time', return_value=101.0):
+                self.assertEqual([self.bid(price).status_code for price in (200, 300)],
+                                 [status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST])
+                response = self.bid(400)
+                self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+                self.assertEqual(response['Retry-After'], '3')
+            with mock.patch('time.time', return_value=103.0):
+                self.assertEqual([store.take('key', 0.5, 2) for _ in range(3)], [0, 0, 1.0])
+            # Next window of capacity / rate seconds starts with a full bucket
+            with mock.patch('time.time', return_value=104.0):
+                self.assertEqual(store.take('key', 0.5, 2), 0)
+
+    def test_shared_store_refuses_local_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            CacheBucketStore().take('key', 0.5, 2)
+
+    @override_settings(BID_THROTTLE_RATE=0)
+    def test_disabled(self):
+        self.assertNotIn(status.HTTP_429_TOO_MANY_REQUESTS, [self.bid(price).status_code for price in (200, 300, 400)])
+
+
+class IdempotencyKeyTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        Auction.objects.filter(pk=2).update(ends_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        self.client.force_authenticate(user = User.objects.create_user('third@example.com'))
+
+    def bid(self, price, key='retry-1'):
+        return self.client.post(reverse('bid-list'), data={'auction': 2, 'price': price}, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_result(self):
+        created = self.bid(200)
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(1):
+            retried = self.bid(200)
+        self.assertEqual((retried.status_code, retried.data), (status.HTTP_201_CREATED, created.data))
+        self.assertEqual(retried['Idempotent-Replayed'], 'true')
+        self.assertEqual(Bid.objects.filter(auction=2).count(), 2)
+
+        # Same key, another payload
+        self.assertEqual(self.bid(300).status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_failed_request_is_not_stored(self):
+        self.assertEqual(self.bid(-1).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bid(200).status_code, status.HTTP_201_CREATED)
+
+    def test_auction_create_is_not_duplicated(self):
+        data = {'cadnumber': '0000000000:00:000:0000', 'size': 1, 'duration': 2, 'region': 1}
+        responses = [self.client.post(reverse('auction-list'), data=data, HTTP_IDEMPOTENCY_KEY='auction-1')
+                     for _ in range(2)]
+        self.assertEqual(responses[0].data['id'], responses[1].data['id'])
+        self.assertEqual(Auction.objects.count(), 3)
+
+    def claim(self, price, expires_in):
+        """ Pending key of a bid request which is still running """
+        request = Request(APIRequestFactory().post(reverse('bid-list'), {'auction': 2, 'price': price}),
+                          parsers=[MultiPartParser()])
+        return IdempotencyKey.objects.create(
+            user=User.objects.get(email='third@example.com'), key='retry-1', fingerprint=request_fingerprint(request),
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=expires_in))
+
+    def test_retry_waits_for_running_request(self):
+        claim = self.claim(200, 30)
+
+        def finish_original(seconds):
+            bid = place_bid(2, claim.user, 200)
+            IdempotencyKey.objects.filter(pk=claim.pk).update(status_code=201, response={'id': bid.pk})
+
+        with mock.patch('auction.idempotency.time.sleep', side_effect=finish_original) as sleep:
+            retried = self.bid(200)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual((retried.status_code, retried['Idempotent-Replayed']), (status.HTTP_201_CREATED, 'true'))
+        self.assertEqual(Bid.objects.filter(auction=2, author=claim.user).count(), 1)
+
+        # Another payload waits for nothing
+        self.assertEqual(self.bid(300).status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_abandoned_claim_is_taken_over(self):
+        self.claim(200, -1)
+        response = self.bid(200)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.get().response['id'], response.data['id'])
+
+    def test_expired_keys(self):
+        self.bid(200)
+        self.client.post(reverse('proxy-list'), {'auction': 2, 'max_price': 300}, HTTP_IDEMPOTENCY_KEY='retry-2')
+        IdempotencyKey.objects.update(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        # Expired key is a new request, author can't bid twice in a row
+        self.assertEqual(self.bid(200).status_code, status.HTTP_400_BAD_REQUEST)
+
+        out = StringIO()
+        call_command('sweep_idempotency_keys', '--batch-size', '1', stdout=out)
+        self.assertIn('Deleted expired idempotency keys: 1', out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class AuctionBatchTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_authenticate(user = self.user_one)
+
+    def test_get_in_requested_order(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('auction-batch'), data={'ids': '2,404,1,2'})
+        self.assertEqual([(row['id'], row['current_price'], row['leader']) for row in response.data['results']],
+                         [(2, 100.0, 1), (1, 100.0, 2)])
+        self.assertEqual((response.data['missing'], response.data['forbidden']), ([404], []))
+        self.assertEqual(response.data['results'][0], self.client.get(reverse('auction-detail', args=[2])).data)
+
+    def test_post_and_object_permissions(self):
+        policy = {'batch': [IsAuthenticated & IsAuthor]}
+        with mock.patch.object(AuctionViewSet, 'permission_classes_per_method', policy):
+            response = self.client.post(reverse('auction-batch'), data={'ids': [1, 2]}, format='json')
+        self.assertEqual([row['id'] for row in response.data['results']], [1])
+        self.assertEqual(response.data['forbidden'], [2])
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get(reverse('auction-batch'), data={'ids': 'one'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('auction-batch')).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RowListTestCase(BaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_authenticate(user = self.user_one)
+        Auction.objects.filter(pk=1).update(photo='photo.jpg', photo_renditions={'thumbnail': 'photo-thumbnail.webp'})
+        Auction.objects.filter(pk=2).close()
+
+    def responses(self, url, data):
+        """ Content of the read-optimized list and of the ModelSerializer list """
+        fast = self.client.get(url, data=data).content
+        with mock.patch.object(RowListMixin, 'get_queryset', lambda view: super(RowListMixin, view).get_queryset()), \
+                mock.patch.object(RowListMixin, 'get_serializer',
+                                  lambda view, *args, **kwargs: super(RowListMixin, view).get_serializer(*args, **kwargs)):
+            return fast, self.client.get(url, data=data).content
+
+    def test_byte_compatible(self):
+        for url, data in [
+            (reverse('auction-list'), {}),
+            (reverse('auction-list'), {'pagination': 'cursor', 'ordering': '-region__name'}),
+            (reverse('bid-list'), {}),
+        ]:
+            fast, baseline = self.responses(url, data)
+            self.assertEqual(fast, baseline)
+
+        fast, _ = self.responses(reverse('auction-list'), {})
+        self.assertIn(b'"thumbnail":"http://testserver/media/photo-thumbnail.webp"', fast)
+        self.assertIn(b'"no_bids":false', fast)
 
+    def test_cursor_of_rows(self):
+        response = self.client.get(reverse('auction-list'), data={'pagination': 'cursor', 'ordering': 'region__name'})
+        self.assertEqual([row['id'] for row in response.data['results']], [2, 1])
+        with mock.patch.object(KeysetPagination, 'page_size', 1):
+            first = self.client.get(reverse('auction-list'), data={'pagination': 'cursor', 'ordering': 'region__name'})
+            second = self.client.get(first.data['next'])
+        self.assertEqual([first.data['results'][0]['id'], second.data['results'][0]['id']], [2, 1])
 
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_serializers', '--rows', '3', '--repeat', '1', stdout=out, stderr=StringIO())
+        self.assertEqual(set(json.loads(out.getvalue())['models']), {'auction', 'bid'})
 
-    
\ No newline at end of file
+    def test_fast_renderer(self):
+        data = {'name': 'line separator', 'price': 1.5, 'items': [None, True]}
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json'), JSONRenderer().render(data, 'application/json'))
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
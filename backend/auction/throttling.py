@@ -0,0 +1,140 @@
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+#Shared cache
+from auction.cache import shared_cache
+
+#Request metrics
+from auction.metrics import registry
+
+
+class BaseBucketStore:
+    """
+    Storage of token buckets: every bucket holds up to `capacity` tokens
+    and gets `rate` tokens per second back, a request takes one token
+    """
+
+    def take(self, key, rate, capacity):
+        """
+        Take a token from the bucket of key.
+        Return 0 on success or seconds until the next token otherwise
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def refill(state, rate, capacity, now):
+        """ Return (tokens, now) of bucket state (tokens, updated) or of a new full bucket """
+        if state is None:
+            return capacity, now
+        tokens, updated = state
+        return min(capacity, tokens + (now - updated) * rate), now
+
+    @staticmethod
+    def consume(tokens, rate):
+        """ Return (tokens left, seconds to wait) """
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / rate
+
+
+class InProcessBucketStore(BaseBucketStore):
+    """
+    Buckets in memory of the current process, limits are per worker.
+    Buckets which are full again are dropped once there are more than max_size of them
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self.refill(self._buckets.get(key), rate, capacity, now)
+            tokens, wait = self.consume(tokens, rate)
+            self._buckets[key] = (tokens, updated)
+            if len(self._buckets) > self.max_size:
+                self._buckets = {name: bucket for name, bucket in self._buckets.items()
+                                 if self.refill(bucket, rate, capacity, now)[0] < capacity}
+        return wait
+
+
+class CacheBucketStore(BaseBucketStore):
+    """
+    Buckets shared by all workers in BID_THROTTLE_CACHE, e.g. Redis or Memcached.
+    A bucket is a counter of its window of capacity / rate seconds, taken with atomic
+    add / incr of the cache, so concurrent attempts never share a token. Refill is per
+    window instead of continuous: up to twice the capacity may pass around a window edge
+    """
+
+    @property
+    def cache(self):
+        return shared_cache('BID_THROTTLE_CACHE')
+
+    def take(self, key, rate, capacity):
+        window = capacity / rate
+        now = time.time()
+        index = int(now // window)
+        key = f'bucket:{key}:{index}'
+        timeout = int(window) + 1
+
+        self.cache.add(key, 0, timeout=timeout)
+        try:
+            taken = self.cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            self.cache.add(key, 1, timeout=timeout)
+            return 0.0
+        if taken <= capacity:
+            return 0.0
+        return (index + 1) * window - now
+
+
+_store = None
+
+
+def get_bucket_store():
+    """ Return bucket store configured by BID_THROTTLE_STORE setting """
+    global _store
+    if _store is None:
+        _store = import_string(getattr(settings, 'BID_THROTTLE_STORE', 'auction.throttling.InProcessBucketStore'))()
+    return _store
+
+
+class BidThrottle(BaseThrottle):
+    """
+    Limit bid attempts of a user on one auction before any database work:
+    BID_THROTTLE_BURST attempts at once, then BID_THROTTLE_RATE per second.
+    Rejected requests get 429 with Retry-After and are counted in auction_throttled_total
+    """
+
+    scope = 'bid'
+
+    def __init__(self):
+        self.rate = settings.BID_THROTTLE_RATE
+        self.capacity = settings.BID_THROTTLE_BURST
+        self._wait = None
+
+    def allow_request(self, request, view):
+        if self.rate <= 0 or not request.user.is_authenticated:
+            return True
+
+        try:
+            auction = int(request.data.get('auction'))
+        except (AttributeError, TypeError, ValueError):
+            # Invalid payload is rejected by the serializer
+            return True
+
+        self._wait = get_bucket_store().take(f'{self.scope}:{request.user.pk}:{auction}', self.rate, self.capacity)
+        if self._wait:
+            registry.inc('auction_throttled_total', (('scope', self.scope),))
+            return False
+        return True
+
+    def wait(self):
+        return self._wait
@@ -6,7 +6,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 #Views
-from auction.views import RegionViewSet, AuctionViewSet, BidViewSet, AuctionAuditView, StatisticView
+from auction.views import RegionViewSet, AuctionViewSet, BidViewSet, AuctionAuditView, StatisticView, AuctionExportView, BidExportView, \
+    AuctionImportView, BidImportView, AuctionLadderView, ProxyBidViewSet
 
 
 #Auctions
@@ -16,8 +17,13 @@ urlpatterns = [
     path('auction/<int:pk>', AuctionViewSet.as_view({'get':'retrieve', 
                                                 'patch':'partial_update', 
                                                 'delete':'destroy'}), name = 'auction-detail'),
+    path('auction/batch', AuctionViewSet.as_view({'get':'batch',
+                                            'post':'batch'}), name = 'auction-batch'),
+    path('auction/<int:pk>/ladder', AuctionLadderView.as_view(), name = 'auction-ladder'),
     path('auction/audit', AuctionAuditView.as_view(), name = 'auction-audit'),
     path('auction/statistic', StatisticView.as_view(), name = 'auction-statistics'),
+    path('auction/export.<str:output>', AuctionExportView.as_view(), name = 'auction-export'),
+    path('auction/import', AuctionImportView.as_view(), name = 'auction-import'),
 ]
 
 #Regions
@@ -30,7 +36,17 @@ urlpatterns +=[
     path('bid/', BidViewSet.as_view({'get':'list',
                                 'post':'create'}), name = 'bid-list'),
     path('bid/<int:pk>', BidViewSet.as_view({'get':'retrieve', 
-                                        'delete':'destroy'}), name = 'bid-detail')
+                                        'delete':'destroy'}), name = 'bid-detail'),
+    path('bid/export.<str:output>', BidExportView.as_view(), name = 'bid-export'),
+    path('bid/import', BidImportView.as_view(), name = 'bid-import'),
+]
+
+#Proxy bids
+urlpatterns +=[
+    path('proxy/', ProxyBidViewSet.as_view({'get':'list',
+                                      'post':'create'}), name = 'proxy-list'),
+    path('proxy/<int:pk>', ProxyBidViewSet.as_view({'get':'retrieve',
+                                               'delete':'destroy'}), name = 'proxy-detail'),
 ]
 
 #Staticfiles & mediafiles
@@ -1,30 +1,58 @@
-from datetime import datetime, timedelta, timezone
+import csv
+from datetime import datetime, timedelta
 
 #Django & DRF
 from rest_framework import viewsets
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from django_filters import rest_framework as filters
-from rest_framework.filters import OrderingFilter
-from django.db.models import Max, ExpressionWrapper, fields, F, Avg, Sum
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from django.db.models import Count, F, Max, Sum, Window
+from django.db.models.functions import Lag
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 
 #Models
-from auction.models import Auction, Region, Bid
+from auction.models import Auction, Region, Bid, ProxyBid, RegionStatistic
 
 #Serializers
-from auction.serializers import AuctionSerializer, RegionSerializer, BidSerializer
+from auction.serializers import AuctionSerializer, RegionSerializer, BidSerializer, ProxyBidSerializer
 
 #Custom permission
 from auction.permissions import IsAuthor, PermissionPolicyMixin, LessThenFiveMinPass
 
+#Services
+from auction.services import place_bid, register_proxy
+
+#Region cache
+from auction.cache import collection_versions, region_cache
+
+#Bid throttling
+from auction.throttling import BidThrottle
+
+#Idempotent create
+from auction.idempotency import IdempotentCreateMixin
+
+#Read-optimized lists
+from auction.rows import RowListMixin
+
+#Bulk import
+from auction.importers import AuctionImporter, BidImporter
+
+#Conditional GET
+from auction.conditional import ConditionalGetMixin
+
+#Custom pagination
+from auction.pagination import OptionalCursorPagination
+
 #Custom filter
-from auction.filters import AuctionFilter, BidFilter
+from auction.filters import AuctionFilter, BidFilter, AuctionOrderingFilter
 
 
 
-class AuctionViewSet(PermissionPolicyMixin, viewsets.ModelViewSet):
+class AuctionViewSet(RowListMixin, IdempotentCreateMixin, PermissionPolicyMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """ 
     ViewSet of actions for Auction class:
     - Creating (POST)
@@ -35,10 +63,14 @@ class AuctionViewSet(PermissionPolicyMixin, viewsets.ModelViewSet):
     """
     
     serializer_class = AuctionSerializer
-    queryset = Auction.objects.all()
-    filter_backends = (filters.DjangoFilterBackend, OrderingFilter)
+    queryset = Auction.objects.select_related('settlement')
+    filter_backends = (filters.DjangoFilterBackend, AuctionOrderingFilter)
     filterset_class = AuctionFilter
     ordering_fields = ['size', 'region__name']
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('id',)
+    # Ordering names of cursor pages which are not model fields
+    cursor_ordering_aliases = {'price': 'current_price'}
 
     permission_classes = [IsAuthenticated]
 
@@ -46,6 +78,9 @@ class AuctionViewSet(PermissionPolicyMixin, viewsets.ModelViewSet):
         "destroy": [IsAuthenticated&IsAuthor&IsAuthenticated],
         "partial_update": [IsAuthenticated&IsAuthor&IsAuthenticated]
     }
+
+    # Ids accepted by one batch request
+    batch_max_ids = 500
    
     def perform_create(self, serializer):
         """
@@ -54,30 +89,67 @@ class AuctionViewSet(PermissionPolicyMixin, viewsets.ModelViewSet):
         """
         serializer.save(author = self.request.user, duration_timedelta = timedelta(hours=serializer.validated_data['duration']))
     
+    def get_collection_version(self, request):
+        """ Collection version of the region filtered by, of all regions otherwise """
+        region = request.query_params.get('region', '')
+        return collection_versions.get(int(region) if region.isdigit() else None)
+
     def get_queryset(self):
         query_set = super().get_queryset()
 
         """
         Implementing:
-        - additional filtering depends on the last bid
         - additional ordering based on price
+        (price is stored in denormalized current_price column)
 
         """
 
-        if 'min_price' in self.request.GET:
-            query_set = query_set.annotate(c_price=Max('bid__price')).filter(c_price__gt = self.request.GET['min_price'])
-
-        if 'max_price' in self.request.GET:
-            query_set = query_set.annotate(c_price=Max('bid__price')).filter(c_price__lt = self.request.GET['max_price'])
-
         if 'ordering' in self.request.GET:
             if '-price' in self.request.GET['ordering'].split(','):
-                query_set = query_set.annotate(c_price=Max('bid__price')).order_by('-c_price')
+                query_set = query_set.order_by('-current_price')
             if 'price' in self.request.GET['ordering'].split(','):
-                query_set = query_set.annotate(c_price=Max('bid__price')).order_by('c_price')
+                query_set = query_set.order_by('current_price')
 
         return query_set
 
+    def batch(self, request):
+        """
+        Auctions of `ids` (?ids=1,2,3 or POST {"ids": [...]} for long lists) in the requested order,
+        read with one query. Ids which don't exist or aren't permitted for the user are listed separately
+        """
+        if request.method == 'POST':
+            raw = request.data.getlist('ids') if hasattr(request.data, 'getlist') else request.data.get('ids')
+        else:
+            raw = request.GET.getlist('ids')
+        if isinstance(raw, (str, int)):
+            raw = [raw]
+        try:
+            ids = list(dict.fromkeys(int(pk) for value in raw or () for pk in str(value).split(',') if pk))
+        except ValueError:
+            raise ValidationError({'ids': ['Expected comma separated auction ids']})
+        if not ids:
+            raise ValidationError({'ids': ['This field is required.']})
+        if len(ids) > self.batch_max_ids:
+            raise ValidationError({'ids': [f'Ensure there are no more than {self.batch_max_ids} ids.']})
+
+        auctions = self.get_queryset().in_bulk(ids)
+        found, forbidden = [], []
+        for pk in ids:
+            if pk not in auctions:
+                continue
+            try:
+                self.check_object_permissions(request, auctions[pk])
+            except PermissionDenied:
+                forbidden.append(pk)
+            else:
+                found.append(auctions[pk])
+
+        return Response({
+            'results': self.get_serializer(found, many=True).data,
+            'missing': [pk for pk in ids if pk not in auctions],
+            'forbidden': forbidden,
+        })
+
 
 class RegionViewSet(viewsets.ModelViewSet):
 
@@ -89,9 +161,20 @@ class RegionViewSet(viewsets.ModelViewSet):
     queryset = Region.objects.all()
 
     permission_classes = [IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serve regions from process-local region cache
+        """
+        regions = [{'id': pk, 'name': name} for pk, name in region_cache.all().items()]
+
+        page = self.paginate_queryset(regions)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(regions)
     
 
-class BidViewSet(PermissionPolicyMixin, viewsets.ModelViewSet):
+class BidViewSet(RowListMixin, IdempotentCreateMixin, PermissionPolicyMixin, viewsets.ModelViewSet):
 
     """
     ViewSet to handle CRUD for Bid class
@@ -101,6 +184,8 @@ class BidViewSet(PermissionPolicyMixin, viewsets.ModelViewSet):
     queryset = Bid.objects.all()
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = BidFilter
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('bid_time', 'id')
 
     permission_classes = [IsAuthenticated]
 
@@ -108,35 +193,136 @@ class BidViewSet(PermissionPolicyMixin, viewsets.ModelViewSet):
         "destroy": [IsAuthenticated&IsAuthor&LessThenFiveMinPass],
     }
 
+    def get_throttles(self):
+        """ Throttle bid attempts only, per user and auction """
+        if self.action == 'create':
+            return [BidThrottle()]
+        return super().get_throttles()
     
     def perform_create(self, serializer):
         """
         Overwritten method
-        Store authorized user as an author of the auction
+        Commit the bid through place_bid() with authorized user as an author
         """
-        serializer.save(author = self.request.user)
+        serializer.instance = place_bid(
+            serializer.validated_data['auction'],
+            self.request.user,
+            serializer.validated_data['price'],
+            serializer.validated_data.get('previous_bid'),
+        )
+
+
+class ProxyBidViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
+
+    """
+    ViewSet of proxy (maximum price) bids of the authorized user:
+    - Creating or raising the maximum of an auction (POST)
+    - View as a list (GET)
+    - Cancelling (DELETE with <int:pk>)
+    """
+
+    serializer_class = ProxyBidSerializer
+    queryset = ProxyBid.objects.all()
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_fields = ['auction']
+
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(author=self.request.user.id).order_by('pk')
+
+    def perform_create(self, serializer):
+        """
+        Overwritten method
+        Store the maximum through register_proxy(), proxies answer at once
+        """
+        serializer.instance, _ = register_proxy(
+            serializer.validated_data['auction'],
+            self.request.user,
+            serializer.validated_data['max_price'],
+        )
+
+
+class AuctionLadderView(APIView):
+    """
+    Bid ladder of the auction:
+    - bids in bid_time order with price increment, time gap (seconds) and bidder rank
+    - top N distinct bidders by their best price (?top=N, 3 by default)
+    Bids are read with one query using window functions over (auction, bid_time) index
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        auction = Auction.objects.filter(pk=pk).values('current_price', 'bid_count').first()
+        if auction is None:
+            raise NotFound()
+
+        try:
+            top = int(request.GET.get('top', 3))
+        except ValueError:
+            raise ValidationError({'top': ['A valid integer is required.']})
+
+        chain = {'order_by': [F('bid_time').asc(), F('id').asc()]}
+        bidder = {'partition_by': [F('author')]}
+        rows = list(Bid.objects.filter(auction=pk).order_by('bid_time', 'id').annotate(
+            previous_price=Window(Lag('price'), **chain),
+            previous_time=Window(Lag('bid_time'), **chain),
+            bidder_best=Window(Max('price'), **bidder),
+            bidder_bids=Window(Count('id'), **bidder),
+        ).values('id', 'author', 'price', 'bid_time', 'previous_bid',
+                 'previous_price', 'previous_time', 'bidder_best', 'bidder_bids'))
+
+        bidders = sorted({row['author']: row for row in rows}.values(), key=lambda row: -row['bidder_best'])
+        ranks = {}
+        for position, row in enumerate(bidders, 1):
+            previous = bidders[position - 2] if position > 1 else None
+            tie = previous is not None and previous['bidder_best'] == row['bidder_best']
+            ranks[row['author']] = ranks[previous['author']] if tie else position
+
+        bids = [{
+            'id': row['id'],
+            'author': row['author'],
+            'price': row['price'],
+            'bid_time': row['bid_time'],
+            'previous_bid': row['previous_bid'],
+            'increment': row['price'] - row['previous_price'] if row['previous_price'] is not None else None,
+            'time_gap': (row['bid_time'] - row['previous_time']).total_seconds() if row['previous_time'] else None,
+            'bidder_rank': ranks[row['author']],
+        } for row in rows]
+
+        top_bidders = [{
+            'author': row['author'],
+            'best_price': row['bidder_best'],
+            'bids': row['bidder_bids'],
+            'rank': ranks[row['author']],
+        } for row in bidders[:max(top, 0)]]
+
+        return Response(data={
+            'auction': pk,
+            'current_price': auction['current_price'],
+            'bid_count': auction['bid_count'],
+            'bids': bids,
+            'top_bidders': top_bidders,
+        }, status=status.HTTP_200_OK)
 
 
 class AuctionAuditView(APIView):
     """
-    To GET iterate over all open auction (closed = False) and check if it is run of time.
-    If so -> make close = True.
-    Return number of closed and remaining auctions.
+    To POST close all open auctions (closed = False) which are run out of time.
+    Return number of closed auctions.
+    Periodic closing is done by `manage.py close_auctions`
     """
-    
-    def get(self, request):
+
+    def post(self, request):
 
         """
-        Retrieve all outdated auctions (start_date+duration_timedelta < now)
-        Set "closed" to all queryset
+        Close outdated auctions (ends_at < now) in batches
         """
 
-        duration = ExpressionWrapper(F('start_date') + F('duration_timedelta'), 
-                                output_field=fields.DateTimeField())
-        auctions = Auction.objects.annotate(finish = duration).filter(finish__lt =  datetime.now(timezone.utc))
-        auctions.update(closed = True)
+        closed = Auction.objects.close_expired()
 
-        return Response(data={"closed":len(auctions)}, status= status.HTTP_200_OK)
+        return Response(data={"closed":closed}, status= status.HTTP_200_OK)
 
 
 class StatisticView (APIView):
@@ -152,15 +338,174 @@ class StatisticView (APIView):
     """
 
     def get(self, request):
-        response_data = {
-            'number_active_lots': Auction.objects.filter(closed = False).count(),
-            'number_all_lots': Auction.objects.all().count(),
-            'avg_land_price': Auction.objects.filter(closed = True).annotate(c_price=Max('bid__price')).aggregate(Avg('c_price'))['c_price__avg'],
-            'all_land_size': Auction.objects.all().aggregate(Sum('size'))['size__sum'],
-            'auctions_with_no_bids': Auction.objects.filter(bid__isnull=True).count(),
-        }
+        """
+        Read counters maintained incrementally in RegionStatistic.
+        ?by_region=true adds the same statistics per region
+        """
+        counters = RegionStatistic.objects.aggregate(**{name: Sum(name) for name in RegionStatistic.COUNTERS})
+        response_data = self.statistic_data(counters)
+
+        if request.GET.get('by_region') == 'true':
+            response_data['regions'] = [
+                dict(self.statistic_data(row), region=row['region'])
+                for row in RegionStatistic.objects.order_by('region').values('region', *RegionStatistic.COUNTERS)
+            ]
 
         return Response(
             data =response_data,
             status= status.HTTP_200_OK
         )
+
+    @staticmethod
+    def statistic_data(counters):
+        sold = counters['closed_lots_with_bids']
+        return {
+            'number_active_lots': counters['number_active_lots'] or 0,
+            'number_all_lots': counters['number_all_lots'] or 0,
+            'avg_land_price': counters['closed_price_sum'] / sold if sold else None,
+            'all_land_size': counters['all_land_size'],
+            'auctions_with_no_bids': counters['auctions_with_no_bids'] or 0,
+        }
+
+
+class EchoBuffer:
+    """ File-like object returning written value, lets csv.writer produce single lines """
+
+    def write(self, value):
+        return value
+
+
+class ExportView(APIView):
+    """
+    Stream all rows selected by filterset as CSV (export.csv) or NDJSON (export.ndjson).
+    Rows are read from a server-side cursor chunk by chunk,
+    so memory does not depend on number of rows
+    """
+
+    permission_classes = [IsAuthenticated]
+    queryset = None
+    filterset_class = None
+    export_fields = ()
+    chunk_size = 2000
+
+    def perform_content_negotiation(self, request, force=False):
+        # Response format comes from the URL, accept any Accept header
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, output):
+        if output not in ('csv', 'ndjson'):
+            raise NotFound('Unknown export format')
+
+        filterset = self.filterset_class(request.GET, queryset=self.queryset.all(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        # Content is streamed after the request left the routing middleware, pin the database now
+        queryset = filterset.qs.using(filterset.qs.db)
+
+        names = [name for name, _ in self.export_fields]
+        rows = (queryset.order_by('pk')
+                .values_list(*[field for _, field in self.export_fields])
+                .iterator(chunk_size=self.chunk_size))
+
+        if output == 'csv':
+            content, content_type = self.csv_lines(names, rows), 'text/csv'
+        else:
+            content, content_type = self.ndjson_lines(names, rows), 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.export_name}.{output}"'
+        return response
+
+    @staticmethod
+    def csv_lines(names, rows):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+
+    @staticmethod
+    def ndjson_lines(names, rows):
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+        for row in rows:
+            yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+class AuctionExportView(ExportView):
+    """
+    Export auctions with their final (current) price.
+    Accepts AuctionFilter parameters
+    """
+
+    queryset = Auction.objects.all()
+    filterset_class = AuctionFilter
+    export_name = 'auctions'
+    export_fields = (
+        ('id', 'id'),
+        ('cadnumber', 'cadnumber'),
+        ('size', 'size'),
+        ('region', 'region_id'),
+        ('region_name', 'region__name'),
+        ('start_date', 'start_date'),
+        ('ends_at', 'ends_at'),
+        ('closed', 'closed'),
+        ('final_price', 'settlement__final_price'),
+        ('price_per_hectare', 'settlement__price_per_hectare'),
+        ('winner', 'settlement__winner_id'),
+        ('author', 'author_id'),
+        ('current_price', 'current_price'),
+        ('leader', 'leader_id'),
+        ('bid_count', 'bid_count'),
+    )
+
+
+class BidExportView(ExportView):
+    """
+    Export bid history.
+    Accepts BidFilter parameters (auction, region, from_time, to_time)
+    """
+
+    queryset = Bid.objects.all()
+    filterset_class = BidFilter
+    export_name = 'bids'
+    export_fields = (
+        ('id', 'id'),
+        ('auction', 'auction_id'),
+        ('price', 'price'),
+        ('bid_time', 'bid_time'),
+        ('author', 'author_id'),
+        ('previous_bid', 'previous_bid_id'),
+    )
+
+
+class ImportView(APIView):
+    """
+    Bulk import of NDJSON body (one JSON object per line).
+    Body is read line by line and inserted in chunks with bulk_create.
+    Return number of created rows and per-line errors
+    """
+
+    permission_classes = [IsAdminUser]
+    importer_class = None
+
+    def post(self, request):
+        lines = request.stream if request.stream is not None else []
+        result = self.importer_class(request.user).run(lines)
+
+        return Response(data=result, status=status.HTTP_200_OK)
+
+
+class AuctionImportView(ImportView):
+    """
+    Import auctions: {"cadnumber", "size", "duration", "region", "start_date"?, "author"?}
+    """
+
+    importer_class = AuctionImporter
+
+
+class BidImportView(ImportView):
+    """
+    Import bid history: {"auction", "author", "price", "bid_time"?}
+    """
+
+    importer_class = BidImporter
@@ -2,6 +2,8 @@
 ASGI config for auction_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Auction event streams (/auction/<pk>/stream) are served in front of Django,
+read endpoints are served by async views of auction_backend.urls_asgi.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
@@ -9,8 +11,26 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_backend.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+
+class AsyncReadsASGIHandler(ASGIHandler):
+    """ Django ASGI handler resolving requests with auction_backend.urls_asgi """
+
+    urlconf = 'auction_backend.urls_asgi'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+
+django_application = AsyncReadsASGIHandler()
+
+from auction.stream import AuctionStreamApplication
+
+application = AuctionStreamApplication(django_application)
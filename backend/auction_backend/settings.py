@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auction.metrics.MetricsMiddleware',
+    'auction.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,7 +63,11 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'auction.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'auction.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100
@@ -88,6 +94,56 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'auction_backend.wsgi.application'
 
+# Pub/sub used by auction event streams (auction.broker.InProcessBroker, auction.broker.PostgresNotifyBroker
+# or auction.broker.RedisBroker). In-process broker only works when bids are placed in the ASGI process
+AUCTION_STREAM_BROKER = os.getenv('AUCTION_STREAM_BROKER', 'auction.broker.InProcessBroker')
+AUCTION_STREAM_REDIS_URL = os.getenv('AUCTION_STREAM_REDIS_URL', 'redis://localhost:6379/0')
+
+# File which mtime is the shared version of process-local region cache (auction.cache)
+REGION_CACHE_VERSION_FILE = os.getenv('REGION_CACHE_VERSION_FILE', '/tmp/auction-region-cache-version')
+
+# Directory where every worker dumps its request metrics, /metrics sums all of them (auction.metrics)
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/auction-metrics')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+# Server-Timing header with DB / serializer timings on every response, only for debugging
+SERVER_TIMING = (os.getenv('SERVER_TIMING', str(DEBUG)) == 'True')
+
+# Step of automatic bids over the best competing price (auction.services.resolve_proxies)
+PROXY_BID_INCREMENT = float(os.getenv('PROXY_BID_INCREMENT', '1'))
+
+# Bid attempts of a user on one auction (auction.throttling.BidThrottle): BID_THROTTLE_BURST at once,
+# then BID_THROTTLE_RATE per second, 0 disables the throttle. Buckets live in process memory
+# (auction.throttling.InProcessBucketStore) or in the BID_THROTTLE_CACHE cache shared by all workers
+# (auction.throttling.CacheBucketStore, needs CACHE_URL)
+BID_THROTTLE_RATE = float(os.getenv('BID_THROTTLE_RATE', '1'))
+BID_THROTTLE_BURST = int(os.getenv('BID_THROTTLE_BURST', '5'))
+BID_THROTTLE_STORE = os.getenv('BID_THROTTLE_STORE', 'auction.throttling.InProcessBucketStore')
+BID_THROTTLE_CACHE = os.getenv('BID_THROTTLE_CACHE', 'default')
+
+# Seconds a create result stays replayable for retries with the same Idempotency-Key (auction.idempotency),
+# expired keys are removed by `manage.py sweep_idempotency_keys`
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+# Seconds a running request holds its key, retries wait for its result meanwhile.
+# A claim left by a crashed worker is taken over after that
+IDEMPOTENCY_PENDING_TIMEOUT = float(os.getenv('IDEMPOTENCY_PENDING_TIMEOUT', '30'))
+
+# Seconds an authenticated user is kept in process memory (auction.cache.UserCache)
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '30'))
+
+# Cache shared by all workers, e.g. CACHE_URL=redis://redis:6379/1.
+# Without it every process has its own LocMemCache
+CACHE_URL = os.getenv('CACHE_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Cache holding versions of auction lists for list ETags (auction.cache.CollectionVersions)
+COLLECTION_VERSION_CACHE = os.getenv('COLLECTION_VERSION_CACHE', 'default')
+
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
@@ -100,9 +156,25 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'), 
         'PORT': os.getenv('DB_PORT'),
+        # Keep connections of the async views thread pool open between queries under ASGI
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '0')),
     }
 }
 
+# Read replicas, comma separated hosts with the credentials of the primary (auction.routers).
+# DB_REPLICA_HOSTS=localhost gives a second alias of the same database for local testing
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica_{index}'] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['auction.routers.PrimaryReplicaRouter']
+
+# Seconds reads of a user stick to the primary after the user wrote something
+REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+# Cache of the marks, has to be shared by all workers (CACHE_URL)
+REPLICA_STICKY_CACHE = os.getenv('REPLICA_STICKY_CACHE', 'default')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -149,6 +221,14 @@ else:
     MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
     MEDIA_URL = 'media/'
 
+# Uploads are always spooled to a temporary file and streamed to storage in chunks
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Photo sizes rendered as WebP by auction.images (longest side in pixels, None keeps original size)
+IMAGE_SIZES = {'thumbnail': 320, 'detail': 1280, 'original': None}
+IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', '80'))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
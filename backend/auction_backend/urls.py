@@ -17,9 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path, re_path
 
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from auction.authentication import VersionedTokenObtainPairSerializer
+from auction.metrics import MetricsView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    re_path(r'^auth/jwt/create/?$', TokenObtainPairView.as_view(serializer_class=VersionedTokenObtainPairSerializer), name='jwt-create'),
     re_path(r'^auth/', include('djoser.urls')),
     re_path(r'^auth/', include('djoser.urls.jwt')),
     path('', include('auction.urls'))
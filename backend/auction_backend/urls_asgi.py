@@ -0,0 +1,19 @@
+"""
+URL configuration of the ASGI application (auction_backend.asgi)
+
+Read endpoints are served by async views (auction.async_views),
+everything else comes from auction_backend.urls
+"""
+
+from django.urls import include, path
+
+from auction.async_views import AsyncAuctionListView, AsyncAuctionDetailView, AsyncBidListView, AsyncStatisticView
+
+
+urlpatterns = [
+    path('auction/', AsyncAuctionListView.as_view(), name='auction-list'),
+    path('auction/<int:pk>', AsyncAuctionDetailView.as_view(), name='auction-detail'),
+    path('auction/statistic', AsyncStatisticView.as_view(), name='auction-statistics'),
+    path('bid/', AsyncBidListView.as_view(), name='bid-list'),
+    path('', include('auction_backend.urls')),
+]